@@ -0,0 +1,105 @@
+# Makes the benchmarks in this directory runnable from the repository root:
+# puts the repository on sys.path and installs the MicroPython stand-ins from
+# the host package. Import this module before importing any of the game or
+# MQTT modules. Under the MicroPython unix port only suite.py runs, the other
+# benchmarks are CPython only. The fake sockets and packets the MQTT
+# benchmarks share live here as well.
+import sys
+
+if sys.implementation.name == "micropython":
+    # the script's directory took the place of the current one on sys.path
+    sys.path.append("")
+    import host  # noqa: F401
+else:
+    import os
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    import host  # noqa: F401
+    from host.uasyncio import Stream  # noqa: F401
+
+from mqtt_as import _put_len, _put_str
+
+
+def publish_packet(topic, msg, retain=False):
+    """an MQTT PUBLISH packet with qos 0, as the broker sends it"""
+    sz = 2 + len(topic) + len(msg)
+    pkt = bytearray(sz + 5)
+    pkt[0] = 0x31 if retain else 0x30
+    i = _put_len(pkt, 1, sz)
+    i = _put_str(pkt, i, topic)
+    pkt[i : i + len(msg)] = msg
+    return bytes(pkt[: i + len(msg)])
+
+
+class FakeSocket:
+    """Non-blocking socket replacement that accepts every write at once and
+    serves reads from a preloaded byte string, at most chunk bytes at a time."""
+
+    def __init__(self, rx=b"", chunk=1460):
+        self.data = memoryview(bytes(rx))
+        self.pos = 0
+        self.chunk = chunk
+        self.tx = bytearray()
+        self.writes = 0
+
+    @property
+    def rx(self):
+        """the bytes not read yet"""
+        return self.data[self.pos:]
+
+    def write(self, buf):
+        self.writes += 1
+        self.tx.extend(buf)
+        return len(buf)
+
+    def read(self, n):
+        n = min(n, self.chunk, len(self.data) - self.pos)
+        if not n:
+            return None
+        self.pos += n
+        return bytes(self.data[self.pos - n : self.pos])
+
+    def readinto(self, buf, n=None):
+        left = len(self.data) - self.pos
+        if not left:
+            return None
+        n = min(len(buf), left if n is None else n, left, self.chunk)
+        buf[:n] = self.data[self.pos : self.pos + n]
+        self.pos += n
+        return n
+
+    def close(self):
+        pass
+
+
+class HostSocket:
+    """Real non-blocking socket with the MicroPython read/write interface."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        sock.setblocking(False)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def write(self, buf):
+        try:
+            return self.sock.send(buf)
+        except BlockingIOError:
+            return None
+
+    def readinto(self, buf, n=None):
+        try:
+            return self.sock.recv_into(buf, n or 0)
+        except BlockingIOError:
+            return None
+
+    def read(self, n):
+        try:
+            return self.sock.recv(n)
+        except BlockingIOError:
+            return None
+
+    def close(self):
+        self.sock.close()
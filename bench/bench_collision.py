@@ -0,0 +1,63 @@
+# Cost of collision checks and food placement with the occupancy grid kept by
+# Snake, compared to walking the body, on a 256x256 headless grid.
+# Run from the repository root: python bench/bench_collision.py
+import _host  # noqa: F401  (installs MicroPython shims)
+
+import random
+import time
+
+from snake import Direction, Food, Snake
+
+GRID_W, GRID_H = 256, 256
+N = 2000
+
+
+def walk_contains(snake, cell):
+    for c in snake.cells():
+        if c == cell:
+            return True
+    return False
+
+
+def make_snake(length):
+    # Serpentine through the grid so that the body never crosses itself
+    snake = Snake(GRID_W, GRID_H, 1, lcd=None)
+    x, y = GRID_W // 2, GRID_H // 2
+    xdir = 1
+    for _ in range(length - 1):
+        if not 0 <= x + xdir < GRID_W:
+            xdir = -xdir
+            y = (y + 1) % GRID_H
+        else:
+            x += xdir
+        snake.push(snake.cell(x, y))
+    snake.direction = Direction(xdir=xdir, ydir=0)
+    return snake
+
+
+random.seed(1)
+rng = random.Random(1)
+for length in (10, 1000, 30000):
+    snake = make_snake(length)
+    probes = [random.randrange(GRID_W * GRID_H) for _ in range(N)]
+
+    t = time.perf_counter()
+    for cell in probes[: N // 10]:
+        walk_contains(snake, cell)
+    t_walk = (time.perf_counter() - t) / (N // 10) * 1e6
+
+    t = time.perf_counter()
+    for cell in probes:
+        snake.contains_cell(cell)
+    t_grid = (time.perf_counter() - t) / N * 1e6
+
+    food = Food(snake, GRID_W, GRID_H, 1, lcd=None, rng=rng)
+    t = time.perf_counter()
+    for _ in range(N):
+        food.reset_position(snake)
+    t_food = (time.perf_counter() - t) / N * 1e6
+
+    print(
+        f"length {length:5}: walk {t_walk:9.2f} us/check, occupancy {t_grid:5.2f} us/check, "
+        f"food placement {t_food:6.2f} us"
+    )
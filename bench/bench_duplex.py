@@ -0,0 +1,101 @@
+# Concurrent publish and receive against a local stand-in broker. Reports how
+# long publishers and the reader wait for their locks, with separate read and
+# write locks and with both sharing one lock as before.
+# Run from the repository root: python bench/bench_duplex.py
+import _host  # noqa: F401  (installs MicroPython shims)
+from _host import HostSocket, Stream, publish_packet
+
+import asyncio
+import socket
+import time
+
+from mqtt_as import MQTTClient, config
+
+DURATION_S = 2
+PUBLISHERS = 3
+
+
+class TimedLock:
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self.waits = []
+
+    async def __aenter__(self):
+        t = time.perf_counter()
+        await self._lock.acquire()
+        self.waits.append(time.perf_counter() - t)
+
+    async def __aexit__(self, *_):
+        self._lock.release()
+
+
+
+async def broker(sock, stop):
+    # Send a stream of inbound messages and swallow whatever the client sends
+    loop = asyncio.get_running_loop()
+    pkt = publish_packet(b"pico-snake-mqtt/B/game", b"x" * 200)
+    received = 0
+    while not stop.is_set():
+        await loop.sock_sendall(sock, pkt * 4)
+        try:
+            received += len(sock.recv(65536))
+        except BlockingIOError:
+            pass
+        await asyncio.sleep(0.002)
+    return received
+
+
+async def run(shared):
+    inbound = 0
+
+    def cb(topic, msg, retained):
+        nonlocal inbound
+        inbound += 1
+
+    client = MQTTClient(dict(config, server="127.0.0.1", subs_cb=cb))
+    remote, local = socket.socketpair()
+    remote.setblocking(False)
+    client._sock = HostSocket(local)
+    client._stream = Stream(client._sock)
+    client._isconnected = True
+    client.lock = TimedLock()
+    client.rlock = client.lock if shared else TimedLock()
+
+    stop = asyncio.Event()
+    published = 0
+
+    async def publisher(k):
+        nonlocal published
+        while not stop.is_set():
+            await client.publish(b"pico-snake-mqtt/A/score", b"%d" % k, False, 0)
+            published += 1
+            await asyncio.sleep(0.001)
+
+    reader = asyncio.create_task(client._handle_msg())
+    tasks = [asyncio.create_task(publisher(k)) for k in range(PUBLISHERS)]
+    brk = asyncio.create_task(broker(remote, stop))
+    await asyncio.sleep(DURATION_S)
+    stop.set()
+    await asyncio.gather(*tasks, brk)
+    reader.cancel()
+    remote.close()
+    local.close()
+
+    mode = "shared lock   " if shared else "read/write lock"
+    for name, lock in (("write", client.lock), ("read", client.rlock)):
+        w = lock.waits
+        if shared and name == "read":
+            break
+        print(
+            f"{mode} {name:5}: {len(w):6} acquisitions, wait mean {sum(w) / len(w) * 1e6:8.1f} us, "
+            f"max {max(w) * 1e6:8.1f} us"
+        )
+    print(f"{mode}      : {published / DURATION_S:8.0f} publishes/s, {inbound / DURATION_S:8.0f} inbound msgs/s")
+
+
+async def main():
+    await run(True)
+    await run(False)
+
+
+asyncio.run(main())
@@ -0,0 +1,130 @@
+# Checks LCD_1inch14.show_region() and show_dirty() against a mock ST7789 that
+# decodes the SPI traffic into its frame memory: after partial flushes the
+# panel must hold exactly what a full flush leaves there. Reports the bytes
+# sent for a typical snake move compared to a full frame.
+# Run from the repository root: python bench/bench_flush.py
+import _host  # noqa: F401  (installs MicroPython shims)
+
+import random
+
+from lcd1in14 import LCD_1inch14, X_OFFSET, Y_OFFSET
+
+TILE = 12
+SPI_HZ = 10_000_000
+
+
+class Panel:
+    """Mock SPI bus with an ST7789 behind it."""
+
+    def __init__(self, lcd):
+        self.lcd = lcd
+        self.memory = bytearray(320 * 240 * 2)
+        self.cmd = None
+        self.args = bytearray()
+        self.cols = self.rows = (0, 0)
+        self.x = self.y = 0
+        self.bytes = 0  # everything sent, commands included
+        self.pixel_bytes = 0
+        self.half = None
+
+    def write(self, buf):
+        buf = bytes(buf)
+        self.bytes += len(buf)
+        if self.lcd.dc.value() == 0:
+            self.cmd = buf[-1]
+            self.args = bytearray()
+            if self.cmd == 0x2C:
+                self.x, self.y = self.cols[0], self.rows[0]
+                self.half = None
+            return
+        if self.cmd == 0x2C:
+            self.pixels(buf)
+            return
+        self.args += buf
+        if len(self.args) == 4:
+            window = (self.args[0] << 8 | self.args[1], self.args[2] << 8 | self.args[3])
+            if self.cmd == 0x2A:
+                self.cols = window
+            elif self.cmd == 0x2B:
+                self.rows = window
+
+    def pixels(self, buf):
+        self.pixel_bytes += len(buf)
+        if self.half is not None:
+            buf = self.half + buf
+            self.half = None
+        if len(buf) % 2:
+            self.half, buf = buf[-1:], buf[:-1]
+        for i in range(0, len(buf), 2):
+            j = (self.y * 320 + self.x) * 2
+            self.memory[j : j + 2] = buf[i : i + 2]
+            self.x += 1
+            if self.x > self.cols[1]:
+                self.x = self.cols[0]
+                self.y += 1
+                if self.y > self.rows[1]:
+                    self.y = self.rows[0]
+
+    def screen(self):
+        """the visible part of the frame memory, laid out like lcd.buffer"""
+        out = bytearray()
+        for y in range(Y_OFFSET, Y_OFFSET + self.lcd.height):
+            j = (y * 320 + X_OFFSET) * 2
+            out += self.memory[j : j + self.lcd.width * 2]
+        return out
+
+    def reset_counts(self):
+        self.bytes = self.pixel_bytes = 0
+
+
+def scribble(lcd, rng, x, y, w, h):
+    """random pixels in a rectangle of the framebuffer"""
+    for row in range(max(y, 0), min(y + h, lcd.height)):
+        for col in range(max(x, 0), min(x + w, lcd.width)):
+            j = (row * lcd.width + col) * 2
+            lcd.buffer[j] = rng.randrange(256)
+            lcd.buffer[j + 1] = rng.randrange(256)
+
+
+def main():
+    rng = random.Random(1)
+    lcd = LCD_1inch14()
+    panel = Panel(lcd)
+    lcd.spi = panel
+
+    scribble(lcd, rng, 0, 0, lcd.width, lcd.height)
+    lcd.show()
+    assert panel.screen() == lcd.buffer
+    full_bytes = panel.bytes
+
+    # random rectangles, some of them partly off screen, some full width
+    for _ in range(200):
+        w = rng.randrange(1, lcd.width + 1) if rng.random() < 0.8 else lcd.width
+        h = rng.randrange(1, 40)
+        x = 0 if w == lcd.width else rng.randrange(-20, lcd.width)
+        y = rng.randrange(-20, lcd.height)
+        scribble(lcd, rng, x, y, w, h)
+        lcd.mark_dirty(x, y, w, h)
+        if rng.random() < 0.3:
+            lcd.show_dirty()
+            assert panel.screen() == lcd.buffer
+    lcd.show_dirty()
+    assert panel.screen() == lcd.buffer
+    print("partial flushes match the full flush")
+
+    # a snake move: new head, old head, removed tail and new tail tiles
+    panel.reset_counts()
+    for cell in (47, 46, 42, 43):
+        y, x = divmod(cell, 20)
+        scribble(lcd, rng, x * TILE, y * TILE, TILE, TILE)
+        lcd.mark_dirty(x * TILE, y * TILE, TILE, TILE)
+    sent = lcd.show_dirty()
+    assert panel.screen() == lcd.buffer
+    assert sent == 4 * TILE * TILE * 2 == panel.pixel_bytes
+
+    for name, n in (("full frame", full_bytes), ("snake move", panel.bytes)):
+        print(f"{name:10}: {n:6} bytes on SPI, {n * 8 / SPI_HZ * 1000:6.2f} ms at {SPI_HZ // 1_000_000} MHz")
+    print(f"reduction : {(1 - panel.bytes / full_bytes) * 100:6.2f}%")
+
+
+main()
@@ -0,0 +1,62 @@
+# Bytes per tick and encode time of the binary game state stream compared to
+# the previous text format ("x,y;x,y;..." from Snake.gamestate_string) at
+# several snake lengths on the default 20x10 grid.
+# Run from the repository root: python bench/bench_gamestate.py
+import _host  # noqa: F401  (installs MicroPython shims)
+
+import time
+
+from gamestate import GamestateDecoder, GamestateEncoder
+from snake import Position, Snake
+
+GRID_W, GRID_H = 20, 10
+N = 2000
+
+
+def serpentine(length):
+    # Snake filling the grid row by row, head last in the returned list
+    cells = []
+    for y in range(GRID_H):
+        xs = range(GRID_W) if y % 2 == 0 else range(GRID_W - 1, -1, -1)
+        cells += [Position(x, y) for x in xs]
+    return cells[:length]
+
+
+def make_snake(length):
+    cells = serpentine(length)
+    snake = Snake(GRID_W, GRID_H, 12, lcd=None)
+    snake.body[snake.head_index] = snake.cell(*cells[0])
+    for pos in cells[1:]:
+        snake.push(snake.cell(*pos))
+    return snake
+
+
+food = Position(0, GRID_H - 1)
+food_cell = food.y * GRID_W + food.x
+for length in (5, 50, 150):
+    snake = make_snake(length)
+
+    t = time.perf_counter()
+    for _ in range(N):
+        text = f"{food.x},{food.y};{snake.gamestate_string()}"
+    t_text = (time.perf_counter() - t) / N * 1e6
+
+    encoder = GamestateEncoder(GRID_W, GRID_H)
+    decoder = GamestateDecoder()
+    size = 0
+    t = time.perf_counter()
+    for k in range(N):
+        if encoder.keyframe_due() or k == 0:
+            payload = encoder.keyframe(snake.cells(), food_cell)
+        else:
+            payload = encoder.delta(snake.head(), True, None)
+        size += len(payload)
+    t_bin = (time.perf_counter() - t) / N * 1e6
+
+    decoder.feed(encoder.keyframe(snake.cells(), food_cell))
+    assert decoder.snake == [tuple(p) for p in snake.positions()]
+    print(
+        f"length {length:3}: text {len(text):4} B/tick {t_text:6.1f} us, "
+        f"binary {size / N:5.1f} B/tick {t_bin:6.1f} us "
+        f"(keyframe {encoder.keyframe_interval} ticks)"
+    )
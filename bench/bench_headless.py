@@ -0,0 +1,16 @@
+# Game steps per second under CPython with the host stand-ins, played by the
+# autopilot from host.sim: headless (render=False) and with every frame drawn
+# and sent to the LCD_1inch14 over the mock SPI.
+# Run from the repository root: python bench/bench_headless.py
+import _host  # noqa: F401  (installs MicroPython shims)
+
+from host import sim
+
+STEPS = {False: 20000, True: 500}
+
+for render, steps in STEPS.items():
+    game, seconds = sim.simulate(steps, render=render)
+    print(
+        f"render={render!s:5}: {steps / seconds:8.0f} steps/s, "
+        f"{game.frames_drawn} frames drawn, previous score {game.previous_score}, score {game.score}"
+    )
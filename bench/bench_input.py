@@ -0,0 +1,128 @@
+# Input handling under quick two-key turns: a mock joystick presses two
+# perpendicular directions 30 ms apart, well within one 120 ms game step.
+# With the key press ring both turns are made, one per step; with the
+# previous single key slot only the second press counted. Also reports the
+# time from key press to the flushed frame that shows the turn, with a
+# display that takes RENDER_MS per frame.
+# Run from the repository root: python bench/bench_input.py
+import _host  # noqa: F401  (installs MicroPython shims)
+
+import asyncio
+import random
+import time
+
+import framebuf
+
+from snake import Game, GAMESTATE_PLAYING, KEY_DOWN, KEY_LEFT, KEY_RIGHT, KEY_UP
+
+RENDER_MS = 6
+PAIRS = 25
+
+
+class MockLCD(framebuf.FrameBuffer):
+    def __init__(self):
+        self.width, self.height = 240, 135
+        super().__init__(bytearray(240 * 135 * 2), 240, 135, framebuf.RGB565)
+
+    def registerKeyUpCallback(self, fn):
+        pass
+
+    registerKeyDownCallback = registerKeyLeftCallback = registerKeyRightCallback = registerKeyUpCallback
+
+    def busy(self):
+        end = time.perf_counter() + RENDER_MS / 1000
+        while time.perf_counter() < end:
+            pass
+        return 0
+
+    def show(self):
+        return self.busy()
+
+    async def show_async(self):
+        return self.busy()
+
+    def mark_dirty(self, *_):
+        pass
+
+    def show_dirty(self):
+        return self.busy()
+
+
+class Pubsubber:
+    player_name_self = "A"
+
+    def __init__(self):
+        self.scores = {p: 0 for p in "ABCDEF"}
+        self.scores_version = 0
+
+    def report_score(self, score):
+        self.scores["A"] = score
+
+    def gamestate_needs_keyframe(self):
+        return False
+
+    def report_gamestate(self, payload):
+        pass
+
+
+class SingleSlotGame(Game):
+    def take_turn(self):
+        # the previous key_press_to_process: only the newest press counts
+        key = 0
+        while self.inputs.pending():
+            key = self.inputs.get()
+        direction = self.snake.direction
+        if key:
+            self.snake.update_direction(key)
+            if self.snake.direction != direction:
+                self.turn_time = self.inputs.time
+
+
+async def run(name, cls):
+    game = cls(20, 10, 12, MockLCD(), Pubsubber(), rng=random.Random(1))
+    # put the food off the grid, so the snake never grows and only turns
+    game.food.pos = None
+    game.food.cell = game.snake.capacity
+
+    async def loop():
+        while True:
+            await game.tick()
+
+    task = asyncio.create_task(loop())
+    rng = random.Random(2)
+    game.keyRightPressed()
+    while game.state != GAMESTATE_PLAYING:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.3)
+
+    press = {
+        KEY_UP: game.keyUpPressed,
+        KEY_DOWN: game.keyDownPressed,
+        KEY_LEFT: game.keyLeftPressed,
+        KEY_RIGHT: game.keyRightPressed,
+    }
+    turns = game.input_count
+    for _ in range(PAIRS):
+        # turn across the current direction, then back along it
+        across, along = (KEY_UP, KEY_DOWN), (KEY_LEFT, KEY_RIGHT)
+        if game.snake.direction.xdir == 0:
+            across, along = along, across
+        press[rng.choice(across)]()
+        await asyncio.sleep(0.03)
+        press[rng.choice(along)]()
+        await asyncio.sleep(0.5 + rng.random() * 0.12)
+    task.cancel()
+    turns = game.input_count - turns
+    print(
+        f"{name:11}: {turns:3} of {2 * PAIRS} turns made, latency mean "
+        f"{game.input_latency_total_us / game.input_count / 1000:6.1f} ms, "
+        f"max {game.input_latency_max_us / 1000:6.1f} ms"
+    )
+
+
+async def main():
+    await run("single slot", SingleSlotGame)
+    await run("ring", Game)
+
+
+asyncio.run(main())
@@ -0,0 +1,74 @@
+# Idle wakeups and end-to-end message latency of MQTTClient._handle_msg with
+# stream (readiness driven) I/O and with sleep_ms polling, over a local
+# socket pair standing in for the broker connection.
+# Run from the repository root: python bench/bench_io.py
+import _host  # noqa: F401  (installs MicroPython shims)
+from _host import HostSocket, Stream, publish_packet
+
+import asyncio
+import socket
+import time
+
+from mqtt_as import MQTTClient, config
+
+IDLE_S = 1
+N = 50
+
+
+
+async def run(stream_io):
+    received = []
+    cfg = dict(
+        config,
+        server="127.0.0.1",
+        stream_io=stream_io,
+        subs_cb=lambda t, m, r: received.append(time.perf_counter()),
+    )
+    client = MQTTClient(cfg)
+    broker, local = socket.socketpair()
+    client._sock = HostSocket(local)
+    client._stream = Stream(client._sock) if stream_io else None
+    client._isconnected = True
+
+    wakeups = 0
+    process = client._process
+
+    async def counting_process(n):
+        nonlocal wakeups
+        wakeups += 1
+        await process(n)
+
+    client._process = counting_process
+    task = asyncio.create_task(client._handle_msg())
+
+    cpu = time.process_time()
+    await asyncio.sleep(IDLE_S)
+    cpu = time.process_time() - cpu
+    idle_wakeups = wakeups / IDLE_S
+
+    latency = 0
+    pkt = publish_packet(b"pico-snake-mqtt/B/score", b"7")
+    for _ in range(N):
+        t = time.perf_counter()
+        broker.send(pkt)
+        while len(received) == 0:
+            await asyncio.sleep(0)
+        latency += received.pop() - t
+        await asyncio.sleep(0.007)
+
+    task.cancel()
+    broker.close()
+    local.close()
+    mode = "stream " if stream_io else "polling"
+    print(
+        f"{mode}: {idle_wakeups:6.1f} idle wakeups/s, {cpu / IDLE_S * 100:5.2f}% idle CPU, "
+        f"{latency / N * 1000:6.3f} ms mean latency"
+    )
+
+
+async def main():
+    await run(False)
+    await run(True)
+
+
+asyncio.run(main())
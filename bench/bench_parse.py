@@ -0,0 +1,40 @@
+# Drain a burst of retained score messages, as received right after
+# subscribing, through MQTT_base.wait_msg from an in-memory socket.
+# Previously every wait_msg call processed exactly one packet, so a burst of
+# N messages took N ._handle_msg cycles of _DEFAULT_MS each.
+# Run from the repository root: python bench/bench_parse.py
+import _host  # noqa: F401  (installs MicroPython shims)
+from _host import FakeSocket, publish_packet
+
+import asyncio
+import time
+
+from mqtt_as import MQTTClient, config, _DEFAULT_MS
+
+N = 60
+
+
+
+async def main():
+    received = []
+    cfg = dict(config, server="127.0.0.1", subs_cb=lambda t, m, r: received.append(len(m)))
+    client = MQTTClient(cfg)
+    client._isconnected = True
+    burst = b"".join(publish_packet(b"pico-snake-mqtt/%d/score" % k, b"%d" % k, retain=True) for k in range(N))
+
+    for chunk in (64, 536, 1460):
+        received.clear()
+        client._sock = FakeSocket(burst, chunk)
+        calls = 0
+        t = time.perf_counter()
+        while client._sock.rx or client._ilen:
+            await client.wait_msg()
+            calls += 1
+        t = (time.perf_counter() - t) * 1000
+        print(
+            f"chunk {chunk:5}: {len(received)} msgs in {calls:3} wait_msg calls, "
+            f"{t:6.2f} ms parse, ~{calls * _DEFAULT_MS} ms drain (was ~{N * _DEFAULT_MS} ms)"
+        )
+
+
+asyncio.run(main())
@@ -0,0 +1,56 @@
+# TickProfiler on a rendered game driven through Game.tick with the step
+# interval at 0: the per-phase summary it would publish, its overhead on the
+# headless tick rate, and the dump converted to Chrome trace events. Pass a
+# file name to keep the trace, for chrome://tracing or ui.perfetto.dev.
+# Run from the repository root: python bench/bench_profile.py [trace.json]
+import _host  # noqa: F401  (installs MicroPython shims)
+
+import asyncio
+import io
+import json
+import sys
+import time
+
+from host import sim
+from host.chrome_trace import convert
+from profiler import TickProfiler
+from replay import Xorshift32
+from snake import GAMESTATE_SHOW_SCORE, KEY_NONE
+
+TICKS = {False: 20000, True: 1000}
+
+
+async def play(game, ticks):
+    game.step_ms = bytes(len(game.step_ms))
+    for _ in range(ticks):
+        if game.state != GAMESTATE_SHOW_SCORE:
+            key = sim.autopilot(game)
+            if key != KEY_NONE:
+                game.inputs.put(key)
+        await game.tick()
+
+
+def ticks_per_s(render, profiler):
+    game = sim.new_game(rng=Xorshift32(1), render=render, profiler=profiler)
+    start = time.perf_counter()
+    asyncio.run(play(game, TICKS[render]))
+    return TICKS[render] / (time.perf_counter() - start)
+
+
+plain = ticks_per_s(False, None)
+profiled = ticks_per_s(False, TickProfiler())
+print(f"headless: {plain:8.0f} ticks/s, {profiled:8.0f} ticks/s profiled")
+
+reports = []
+profiler = TickProfiler(report=reports.append, report_ms=0)
+ticks_per_s(True, profiler)
+print(f"rendered, p50/p99 in us: {reports[-1]}")
+
+dump = io.StringIO()
+profiler.dump(dump)
+trace = convert(dump.getvalue().splitlines())
+names = [event["name"] for event in trace["traceEvents"]]
+print(f"trace: {len(names)} events, {names.count('tick')} ticks from a ring of {profiler.events} events")
+if len(sys.argv) > 1:
+    with open(sys.argv[1], "w") as f:
+        json.dump(trace, f)
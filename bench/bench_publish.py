@@ -0,0 +1,77 @@
+# Publish latency and lock hold time of MQTT_base against an in-memory socket.
+# Compares the single-write packet assembly with the previous sequence of one
+# socket write (and one poll delay) per packet field.
+# Run from the repository root: python bench/bench_publish.py
+import _host  # noqa: F401  (installs MicroPython shims)
+from _host import FakeSocket
+
+import asyncio
+import struct
+import time
+
+from mqtt_as import MQTTClient, config, _SOCKET_POLL_DELAY
+
+N = 200
+TOPIC = b"pico-snake-mqtt/A/score"
+MSG = b"42"
+
+
+async def legacy_write(client, data, length=0):
+    data = memoryview(data)
+    if length:
+        data = data[:length]
+    while data:
+        n = client._sock.write(data)
+        data = data[n:]
+        await asyncio.sleep_ms(_SOCKET_POLL_DELAY)
+
+
+async def legacy_publish(client, topic, msg, retain, qos, dup, pid):
+    pkt = bytearray(b"\x30\0\0\0")
+    pkt[0] |= qos << 1 | retain | dup << 3
+    sz = 2 + len(topic) + len(msg)
+    if qos > 0:
+        sz += 2
+    i = 1
+    while sz > 0x7F:
+        pkt[i] = (sz & 0x7F) | 0x80
+        sz >>= 7
+        i += 1
+    pkt[i] = sz
+    await legacy_write(client, pkt, i + 1)
+    await legacy_write(client, struct.pack("!H", len(topic)))
+    await legacy_write(client, topic)
+    if qos > 0:
+        struct.pack_into("!H", pkt, 0, pid)
+        await legacy_write(client, pkt, 2)
+    await legacy_write(client, msg)
+
+
+async def run(client, publish):
+    latency = 0
+    hold = 0
+    for pid in range(1, N + 1):
+        t0 = time.perf_counter()
+        async with client.lock:
+            t1 = time.perf_counter()
+            await publish(TOPIC, MSG, True, 0, 0, pid)
+            hold += time.perf_counter() - t1
+        latency += time.perf_counter() - t0
+    return latency / N * 1000, hold / N * 1000
+
+
+async def main():
+    cfg = dict(config, server="127.0.0.1")
+    client = MQTTClient(cfg)
+    client._isconnected = True
+
+    client._sock = FakeSocket()
+    lat, hold = await run(client, lambda *a: legacy_publish(client, *a))
+    print(f"legacy  : {lat:7.3f} ms/publish, lock held {hold:7.3f} ms, {client._sock.writes // N} writes")
+
+    client._sock = FakeSocket()
+    lat, hold = await run(client, client._publish)
+    print(f"single  : {lat:7.3f} ms/publish, lock held {hold:7.3f} ms, {client._sock.writes // N} writes")
+
+
+asyncio.run(main())
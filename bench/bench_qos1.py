@@ -0,0 +1,73 @@
+# QoS 1 publish throughput against a local stand-in broker that answers each
+# PUBLISH with a PUBACK after a fixed round trip delay, for several in-flight
+# window sizes. Previously each publish polled for its PUBACK every 100 ms.
+# Run from the repository root: python bench/bench_qos1.py
+import _host  # noqa: F401  (installs MicroPython shims)
+from _host import HostSocket, Stream
+
+import asyncio
+import socket
+import time
+
+from mqtt_as import MQTTClient, config, _get_len
+
+N = 400
+RTT_S = 0.005
+
+
+async def broker(sock):
+    # Acknowledge every qos 1 PUBLISH after RTT_S
+    loop = asyncio.get_running_loop()
+    buf = bytearray()
+
+    def ack(pid):
+        sock.send(bytes((0x40, 0x02, pid >> 8, pid & 0xFF)))
+
+    while True:
+        data = await loop.sock_recv(sock, 65536)
+        if not data:
+            return
+        buf += data
+        while buf:
+            hdr = _get_len(buf, 1, len(buf))
+            if hdr is None or hdr[0] + hdr[1] > len(buf):
+                break
+            sz, j = hdr
+            if buf[0] & 0x06:
+                topic_len = buf[j] << 8 | buf[j + 1]
+                k = j + 2 + topic_len
+                loop.call_later(RTT_S, ack, buf[k] << 8 | buf[k + 1])
+            del buf[: j + sz]
+
+
+async def run(window):
+    client = MQTTClient(dict(config, server="127.0.0.1", max_inflight=window))
+    remote, local = socket.socketpair()
+    remote.setblocking(False)
+    client._sock = HostSocket(local)
+    client._stream = Stream(client._sock)
+    client._isconnected = True
+    tasks = [
+        asyncio.create_task(client._handle_msg()),
+        asyncio.create_task(client._republish()),
+        asyncio.create_task(broker(remote)),
+    ]
+
+    t = time.perf_counter()
+    await asyncio.gather(
+        *(client.publish(b"pico-snake-mqtt/A/score", b"%d" % k, qos=1) for k in range(N))
+    )
+    t = time.perf_counter() - t
+    print(f"window {window:3}: {N / t:8.0f} qos 1 msgs/s ({RTT_S * 1000:.0f} ms broker RTT)")
+    for task in tasks:
+        task.cancel()
+    remote.close()
+    local.close()
+
+
+async def main():
+    for window in (1, 4, 16, 64):
+        await run(window)
+
+
+asyncio.run(main())
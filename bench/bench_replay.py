@@ -0,0 +1,89 @@
+# Records a game played by the autopilot from host.sim, replays it twice and
+# checks that every replay publishes exactly the same scores and game states
+# as the recorded game. Reports the size of the recording and, per replayed
+# step, time, allocations and published bytes: the numbers to compare
+# between versions on the same recording.
+# Run from the repository root: python bench/bench_replay.py
+import _host  # noqa: F401  (installs MicroPython shims)
+
+import asyncio
+import hashlib
+import io
+import time
+import tracemalloc
+
+from host import sim
+from replay import Recorder, Replayer, Xorshift32
+from snake import GAMESTATE_READY_TO_START, KEY_NONE
+
+SEED = 0x5EED
+STEPS = 20000
+
+
+class Published:
+    """Hashes everything the game hands to its pubsubber for publishing."""
+
+    def __init__(self, game):
+        self.hash = hashlib.sha256()
+        self.bytes = 0
+        pubsubber = game.pubsubber
+        report_score, report_gamestate = pubsubber.report_score, pubsubber.report_gamestate
+
+        def score(value):
+            self.add(b"S%d" % value)
+            report_score(value)
+
+        def gamestate(payload):
+            self.add(bytes(payload))
+            report_gamestate(payload)
+
+        pubsubber.report_score = score
+        pubsubber.report_gamestate = gamestate
+
+    def add(self, data):
+        self.hash.update(data)
+        self.bytes += len(data)
+
+
+def dawdling(game):
+    # wait a few steps on the start screen before pressing a key
+    if game.state == GAMESTATE_READY_TO_START and game.steps_waited < 7:
+        game.steps_waited += 1
+        return KEY_NONE
+    game.steps_waited = 0
+    return sim.autopilot(game)
+
+
+recording = io.BytesIO()
+recorder = Recorder(recording, SEED, 20, 10)
+# Published starts hashing after Game.__init__ reported the first score and
+# keyframe, so for a fair comparison the replays are hooked the same way.
+game = sim.new_game(rng=Xorshift32(SEED), recorder=recorder)
+published = Published(game)
+game.steps_waited = 0
+asyncio.run(sim.run(game, STEPS, dawdling))
+recorder.close()
+data = recording.getvalue()
+print(
+    f"recorded {STEPS} steps into {len(data)} bytes ({len(data) * 8 / STEPS:.2f} bits/step), "
+    f"{published.bytes} bytes published"
+)
+
+for attempt in (1, 2):
+    replayer = Replayer(data)
+    game = sim.new_game(rng=replayer.rng())
+    replayed = Published(game)
+    tracemalloc.start()
+    start = time.perf_counter()
+    steps = asyncio.run(replayer.run(game))
+    seconds = time.perf_counter() - start
+    allocated = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    same = replayed.hash.digest() == published.hash.digest()
+    print(
+        f"replay {attempt}: {steps} steps, {'identical' if same else 'DIFFERENT'} publications, "
+        f"{seconds / steps * 1e6:6.1f} us/step, {replayed.bytes / steps:5.2f} B/step published, "
+        f"peak traced memory {allocated} B"
+    )
+    if not same:
+        raise SystemExit(1)
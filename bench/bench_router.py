@@ -0,0 +1,61 @@
+# Messages routed per second by mqtt_as.TopicRouter with a few dozen
+# subscriptions, compared to decoding and splitting every topic as
+# SnakePubsubber.subber used to do and checking it against each filter.
+# Run from the repository root: python bench/bench_router.py
+import _host  # noqa: F401  (installs MicroPython shims)
+
+import time
+
+from mqtt_as import TopicRouter
+
+PREFIX = "pico-snake-mqtt"
+PLAYERS = "ABCDEF"
+N = 100_000
+
+hits = 0
+
+
+def handler(topic, msg, retained, *wildcards):
+    global hits
+    hits += 1
+
+
+def legacy_match(parts, filter_parts):
+    for k, f in enumerate(filter_parts):
+        if f == "#":
+            return True
+        if k >= len(parts) or (f != "+" and f != parts[k]):
+            return False
+    return len(parts) == len(filter_parts)
+
+
+def legacy(topic, msg, retained):
+    # Decode, split and compare against every filter in turn
+    parts = topic.decode().split("/")
+    for filter_parts in legacy_filters:
+        if legacy_match(parts, filter_parts):
+            handler(topic, msg, retained)
+
+
+filters = [f"{PREFIX}/+/score", f"{PREFIX}/+/game", f"{PREFIX}/+/perf", f"{PREFIX}/config/#"]
+for p in PLAYERS:
+    for sub in ("presence", "team", "name", "level", "lives"):
+        filters.append(f"{PREFIX}/{p}/{sub}")
+filters += [f"other/app{k}/+/state" for k in range(10)]
+
+router = TopicRouter()
+for f in filters:
+    router.add(f, handler)
+legacy_filters = [f.split("/") for f in filters]
+
+topics = [f"{PREFIX}/{p}/score".encode() for p in PLAYERS]
+topics += [f"{PREFIX}/{p}/presence".encode() for p in PLAYERS]
+topics += [f"{PREFIX}/config/speed/max".encode(), b"other/app3/x/state"]
+
+for name, route in (("legacy split", legacy), ("trie router ", router.route)):
+    hits = 0
+    t = time.perf_counter()
+    for k in range(N):
+        route(topics[k % len(topics)], b"1", False)
+    t = time.perf_counter() - t
+    print(f"{name}: {N / t:10.0f} msgs/s, {len(filters)} filters ({hits} handled)")
@@ -0,0 +1,129 @@
+# Step timing of Game.tick's deadline scheduling compared to the previous
+# loop, which woke every 10 ms and ran a step on every frame_skip-th wakeup.
+# A mock display takes RENDER_MS to flush each frame. Reports wakeups per
+# second and how far step intervals stray from the nominal one.
+# Run from the repository root: python bench/bench_scheduler.py
+import _host  # noqa: F401  (installs MicroPython shims)
+
+import asyncio
+import random
+import time
+
+import framebuf
+
+from snake import Game
+
+RENDER_MS = 6
+DURATION_S = 3
+
+
+class MockLCD(framebuf.FrameBuffer):
+    def __init__(self):
+        self.width, self.height = 240, 135
+        super().__init__(bytearray(240 * 135 * 2), 240, 135, framebuf.RGB565)
+
+    def registerKeyUpCallback(self, fn):
+        pass
+
+    registerKeyDownCallback = registerKeyLeftCallback = registerKeyRightCallback = registerKeyUpCallback
+
+    def busy(self):
+        end = time.perf_counter() + RENDER_MS / 1000
+        while time.perf_counter() < end:
+            pass
+        return 0
+
+    def show(self):
+        return self.busy()
+
+    async def show_async(self):
+        return self.busy()
+
+    def mark_dirty(self, *_):
+        pass
+
+    def show_dirty(self):
+        return self.busy()
+
+
+class Pubsubber:
+    player_name_self = "A"
+
+    def __init__(self):
+        self.scores = {p: 0 for p in "ABCDEF"}
+        self.scores_version = 0
+
+    def report_score(self, score):
+        self.scores["A"] = score
+
+    def gamestate_needs_keyframe(self):
+        return False
+
+    def report_gamestate(self, payload):
+        pass
+
+
+def new_game():
+    game = Game(20, 10, 12, MockLCD(), Pubsubber(), rng=random.Random(1))
+    step = game.step
+    times = []
+
+    async def timed_step():
+        # no key is ever pressed, every step draws the start screen
+        times.append(time.perf_counter())
+        await step()
+
+    game.step = timed_step
+    return game, times
+
+
+async def polling(game):
+    # the previous Game.tick
+    frame_count = 0
+    while True:
+        frame_skip = int(game.map_to_range(game.score, 0, 50, game.slow, game.fast))
+        if frame_count % frame_skip == 0:
+            await game.step()
+        frame_count += 1
+        await asyncio.sleep(0.01)
+
+
+async def deadline(game):
+    while True:
+        await game.tick()
+
+
+async def run(name, loop):
+    game, times = new_game()
+    wakeups = 0
+    sleep = asyncio.sleep
+
+    async def counting_sleep(s):
+        nonlocal wakeups
+        wakeups += 1
+        await sleep(s)
+
+    # uasyncio.sleep_ms from host goes through asyncio.sleep as well
+    asyncio.sleep = counting_sleep
+    task = asyncio.create_task(loop(game))
+    await sleep(DURATION_S)
+    task.cancel()
+    asyncio.sleep = sleep
+
+    nominal = game.step_ms[0] / 1000
+    intervals = [b - a for a, b in zip(times, times[1:])]
+    errors = sorted(abs(i - nominal) for i in intervals)
+    mean = sum(intervals) / len(intervals)
+    print(
+        f"{name:8}: {wakeups / DURATION_S:5.1f} wakeups/s, step interval mean {mean * 1000:6.1f} ms "
+        f"(nominal {nominal * 1000:.0f} ms), error median {errors[len(errors) // 2] * 1000:5.2f} ms, "
+        f"max {errors[-1] * 1000:5.2f} ms"
+    )
+
+
+async def main():
+    await run("polling", polling)
+    await run("deadline", deadline)
+
+
+asyncio.run(main())
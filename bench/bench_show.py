@@ -0,0 +1,104 @@
+# Event loop stalls while the full framebuffer goes to the display,
+# with the blocking show(), with show_async() at several chunk sizes and
+# with the DMA variant. The mock SPI bus blocks for as long as the bytes
+# would take at 10 MHz; the mock DMA engine transfers in a thread and
+# raises its interrupt on the event loop when done.
+# Run from the repository root: python bench/bench_show.py
+import _host  # noqa: F401  (installs MicroPython shims)
+
+import asyncio
+import sys
+import threading
+import time
+import types
+
+SPI_HZ = 10_000_000
+FRAMES = 10
+
+
+def transfer_time(n):
+    return n * 8 / SPI_HZ
+
+
+class BlockingSPI:
+    def write(self, buf):
+        end = time.perf_counter() + transfer_time(len(buf))
+        while time.perf_counter() < end:
+            pass
+
+
+class DMA:
+    def __init__(self):
+        self.handler = None
+
+    def irq(self, handler=None, hard=False):
+        self.handler = handler
+
+    def pack_ctrl(self, **_):
+        return 0
+
+    def config(self, read=None, write=None, count=0, ctrl=0, trigger=False):
+        loop = asyncio.get_running_loop()
+
+        def run():
+            time.sleep(transfer_time(count))
+            loop.call_soon_threadsafe(self.handler, self)
+
+        threading.Thread(target=run).start()
+
+
+sys.modules["rp2"] = types.ModuleType("rp2")
+sys.modules["rp2"].DMA = DMA
+
+from lcd1in14 import LCD_1inch14  # noqa: E402
+
+
+async def measure(flush):
+    stop = False
+    gaps = []
+
+    async def ticker():
+        t = time.perf_counter()
+        while not stop:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            gaps.append(now - t)
+            t = now
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        await flush()
+        await asyncio.sleep(0)
+    elapsed = (time.perf_counter() - start) / FRAMES
+    stop = True
+    await task
+    gaps.sort()
+    return gaps[-1], gaps[len(gaps) * 999 // 1000], elapsed
+
+
+async def main():
+    sys.setswitchinterval(0.0001)  # the DMA thread must not hold up the loop
+    lcd = LCD_1inch14()
+    lcd.spi = BlockingSPI()
+
+    async def blocking():
+        lcd.show()
+
+    modes = [("show()", blocking)]
+    for chunk in (8192, 4096, 1024, 256):
+        modes.append((f"show_async({chunk})", lambda chunk=chunk: lcd.show_async(chunk)))
+    dma_lcd = LCD_1inch14(dma=True)
+    dma_lcd.spi = BlockingSPI()
+    modes.append(("show_async() by DMA", dma_lcd.show_async))
+
+    for name, flush in modes:
+        worst, p999, elapsed = await measure(flush)
+        print(
+            f"{name:20}: loop stall max {worst * 1000:6.2f} ms, 99.9th percentile {p999 * 1000:6.2f} ms, "
+            f"{elapsed * 1000:6.2f} ms per frame"
+        )
+
+
+asyncio.run(main())
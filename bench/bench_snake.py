@@ -0,0 +1,86 @@
+# Headless game steps per second (move, collision check, push, pop) for the
+# ring buffer snake body and for the previous linked list of SnakeNodes, at
+# several snake lengths.
+# Run from the repository root: python bench/bench_snake.py
+import _host  # noqa: F401  (installs MicroPython shims)
+
+import time
+
+from snake import Direction, Position, Snake
+
+GRID_W, GRID_H = 250, 10
+N = 5000
+
+
+class SnakeNode:
+    def __init__(self, position=None, direction=None, next=None):
+        self.pos = position
+        self.dir = direction
+        self.next = next
+
+
+class LinkedListSnake:
+    # The previous body implementation, reduced to what a game step uses
+    def __init__(self):
+        self.direction = Direction(xdir=1, ydir=0)
+        self.head = SnakeNode(Position(0, GRID_H // 2), self.direction)
+
+    def push(self, new_head):
+        new_head.next, self.head = self.head, new_head
+
+    def pop(self):
+        current_node = self.head
+        previous_node = None
+        while current_node.next != None:
+            previous_node = current_node
+            current_node = current_node.next
+        if previous_node != None:
+            previous_node.next = None
+
+    def contains(self, position):
+        current_node = self.head
+        while current_node != None:
+            if current_node.pos == position:
+                return True
+            current_node = current_node.next
+        return False
+
+    def move(self):
+        x_dir, y_dir = self.direction
+        head_x, head_y = self.head.pos
+        head_x = (head_x + x_dir) % GRID_W
+        head_y = (head_y + y_dir) % GRID_H
+        return SnakeNode(Position(x=head_x, y=head_y), self.direction)
+
+
+def step_linked(snake):
+    new_head = snake.move()
+    if snake.contains(new_head.pos):
+        raise RuntimeError("collision")
+    snake.push(new_head)
+    snake.pop()
+
+
+def step_ring(snake):
+    new_head = snake.move()
+    if snake.contains_cell(new_head):
+        raise RuntimeError("collision")
+    snake.push(new_head)
+    snake.pop()
+
+
+for length in (5, 50, 200):
+    linked = LinkedListSnake()
+    ring = Snake(GRID_W, GRID_H, 12, lcd=None)
+    ring.direction = Direction(xdir=1, ydir=0)
+    for _ in range(length - 1):
+        linked.push(linked.move())
+        ring.push(ring.move())
+
+    results = []
+    for snake, step in ((linked, step_linked), (ring, step_ring)):
+        t = time.perf_counter()
+        for _ in range(N):
+            step(snake)
+        results.append(N / (time.perf_counter() - t))
+    print(f"length {length:3}: linked list {results[0]:9.0f} steps/s, ring buffer {results[1]:9.0f} steps/s")
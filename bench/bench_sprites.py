@@ -0,0 +1,98 @@
+# Time to draw a long snake and the food by blitting prerendered sprites,
+# compared to the previous drawing with ellipse() and a rect() per link.
+# Under CPython the pixels are drawn by the pure Python framebuf from host,
+# which makes blit() look expensive next to rect(); on a device all of them
+# are C. So the draw is also timed against a framebuffer that ignores the
+# calls, which leaves the Python side of drawing, and the calls are counted.
+# Run from the repository root: python bench/bench_sprites.py
+import _host  # noqa: F401  (installs MicroPython shims)
+
+import time
+
+import framebuf
+
+from snake import Food, Snake, background_color, food_color, snake_color
+from sprites import Sprites
+
+GRID_W, GRID_H, TILE = 20, 10, 12
+N = 200
+
+
+def legacy_line(lcd, x1, y1, x2, y2):
+    start_x = min(x1, x2) - 2
+    start_y = min(y1, y2) - 2
+    if x1 == x2:
+        w, h = 4, 4 + abs(y1 - y2)
+    else:
+        w, h = 4 + abs(x1 - x2), 4
+    lcd.rect(start_x, start_y, w, h, snake_color, True)
+
+
+def legacy_show(snake, food, lcd):
+    # The previous Snake.show() and Food.show()
+    ts, half = TILE, TILE // 2
+    fx, fy = food.pos
+    lcd.ellipse(fx * ts + half, fy * ts + half, (ts - 2) // 2, (ts - 2) // 2, food_color, True)
+    first = True
+    for cell in snake.cells():
+        y1, x1 = divmod(cell, GRID_W)
+        if not first:
+            if not (abs(x1 - x2) > 1 or abs(y1 - y2) > 1):
+                legacy_line(lcd, x1 * ts + half, y1 * ts + half, x2 * ts + half, y2 * ts + half)
+        else:
+            r = (ts - 4) // 2
+            lcd.ellipse(x1 * ts + half, y1 * ts + half, r, r, snake_color, True)
+            first = False
+        x2, y2 = x1, y1
+
+
+def sprite_show(snake, food, lcd):
+    food.show()
+    snake.show()
+
+
+class NullFrameBuffer:
+    def __init__(self):
+        self.calls = 0
+
+    def _call(self, *_):
+        self.calls += 1
+
+    fill = rect = ellipse = blit = _call
+
+
+def main():
+    lcd = framebuf.FrameBuffer(bytearray(240 * 135 * 2), 240, 135, framebuf.RGB565)
+    t = time.perf_counter()
+    sprites = Sprites(TILE, snake_color, food_color, background_color)
+    build = time.perf_counter() - t
+
+    snake = Snake(GRID_W, GRID_H, TILE, lcd, sprites=sprites)
+    # serpentine through the grid, leaving the last row free for the food
+    for y in range(GRID_H - 1):
+        for x in range(GRID_W) if y % 2 == 0 else range(GRID_W - 1, -1, -1):
+            snake.push(snake.cell(x, y))
+    snake.pop()  # the start cell
+    food = Food(snake, GRID_W, GRID_H, TILE, lcd, sprites=sprites)
+
+    null = NullFrameBuffer()
+
+    print(f"sprites built in {build * 1000:.2f} ms")
+    print(f"per draw of {snake.length} segments and the food:")
+    for name, show in (("ellipse/rect", legacy_show), ("sprites", sprite_show)):
+        times = []
+        for target in (lcd, null):
+            snake.lcd = food.lcd = target
+            t = time.perf_counter()
+            for _ in range(N):
+                show(snake, food, target)
+            times.append((time.perf_counter() - t) / N)
+        calls = null.calls // N
+        null.calls = 0
+        print(
+            f"{name:12}: {times[0] * 1000:7.3f} ms with host framebuf, "
+            f"{times[1] * 1000:7.3f} ms without pixels, {calls} framebuf calls"
+        )
+
+
+main()
@@ -0,0 +1,285 @@
+# Benchmark suite for regression runs. Times the game loop, the renderer and
+# the MQTT codec in microseconds per operation, best of a few rounds, and
+# compares the results with a stored baseline. Runs under CPython and under
+# the MicroPython unix port (which needs framebuf), from the repository root:
+#
+#   python bench/suite.py [options] [name ...]
+#   micropython bench/suite.py [options] [name ...]
+#
+#   --out FILE         write the results as JSON to FILE
+#   --baseline FILE    compare with FILE, default bench/baseline-<impl>.json
+#                      where impl is cpython or micropython
+#   --save-baseline    write the results to the baseline file instead
+#   --threshold F      fail if a benchmark got slower than the baseline by
+#                      more than the fraction F, default 0.25
+#   name ...           run only the benchmarks whose names contain one of these
+#
+# The exit status is 1 if a regression was found, 2 on bad arguments. Numbers
+# are only comparable between runs on the same machine and implementation.
+import _host  # noqa: F401  (installs MicroPython shims)
+from _host import FakeSocket, publish_packet
+
+import asyncio
+import gc
+import json
+import sys
+
+from utime import ticks_us, ticks_diff
+
+from host import sim
+from mqtt_as import MQTTClient, config
+from replay import Xorshift32
+from snake import Direction, Food, Snake, GAMESTATE_SHOW_SCORE, KEY_NONE
+
+ROUNDS = 7
+DEFAULT_THRESHOLD = 0.25
+SEED = 0x5EED
+TOPIC = b"pico-snake-mqtt/A/score"
+MSG = b"42"
+
+
+def timed(fn, n):
+    """microseconds per call of fn, over n calls"""
+    start = ticks_us()
+    for _ in range(n):
+        fn()
+    return ticks_diff(ticks_us(), start) / n
+
+
+def snake_step(length):
+    # move, collision check, push and pop, on a single row grid wide enough
+    # for the snake to never run into itself
+    snake = Snake(256, 1, 12, lcd=None)
+    snake.direction = Direction(xdir=1, ydir=0)
+    for _ in range(length - 1):
+        snake.push(snake.move())
+
+    def step():
+        cell = snake.move()
+        if snake.contains_cell(cell):
+            raise RuntimeError("collision")
+        snake.push(cell)
+        snake.pop()
+
+    return lambda: timed(step, 20000)
+
+
+def food_reset(fill):
+    # the 20x10 grid of the game, covered by the snake to the fill ratio
+    snake = Snake(20, 10, 12, lcd=None)
+    for cell in range(snake.capacity):
+        if snake.length >= snake.capacity * fill:
+            break
+        if not snake.contains_cell(cell):
+            snake.push(cell)
+    food = Food(snake, 20, 10, 12, lcd=None, rng=Xorshift32(SEED))
+    return lambda: timed(lambda: food.reset_position(snake), 20000)
+
+
+def game_tick(render):
+    # Game.tick with the step interval at 0, played by the autopilot from
+    # host.sim, whose time is included
+    game = sim.new_game(rng=Xorshift32(SEED), render=render)
+    game.step_ms = bytes(len(game.step_ms))
+    n = 2000 if render else 10000
+
+    async def run():
+        start = ticks_us()
+        for _ in range(n):
+            if game.state != GAMESTATE_SHOW_SCORE:
+                key = sim.autopilot(game)
+                if key != KEY_NONE:
+                    game.inputs.put(key)
+            await game.tick()
+        return ticks_diff(ticks_us(), start) / n
+
+    return lambda: asyncio.run(run())
+
+
+def game_stats(rerender):
+    game = sim.new_game(rng=Xorshift32(SEED), render=True)
+    game.draw_game_stats()
+
+    def draw():
+        if rerender:
+            game.pubsubber.scores_version += 1
+        game.draw_game_stats()
+
+    return lambda: timed(draw, 500)
+
+
+class MockSPI:
+    """Copies what is written into a buffer, in place of the transfer."""
+
+    def __init__(self, size):
+        self.sink = bytearray(size)
+
+    def write(self, buf):
+        self.sink[: len(buf)] = buf
+
+
+def new_lcd():
+    lcd = sim.new_game(rng=Xorshift32(SEED), render=True).lcd
+    lcd.spi = MockSPI(len(lcd.buffer))
+    return lcd
+
+
+def lcd_show():
+    lcd = new_lcd()
+    return lambda: timed(lcd.show, 200)
+
+
+def lcd_show_tile():
+    lcd = new_lcd()
+    return lambda: timed(lambda: lcd.show_region(24, 36, 12, 12), 2000)
+
+
+def new_client():
+    client = MQTTClient(dict(config, server="127.0.0.1"))
+    client._isconnected = True
+    return client
+
+
+def mqtt_publish():
+    client = new_client()
+    n = 2000
+
+    async def run():
+        client._sock = FakeSocket()
+        start = ticks_us()
+        for pid in range(1, n + 1):
+            await client._publish(TOPIC, MSG, True, 0, 0, pid)
+        return ticks_diff(ticks_us(), start) / n
+
+    return lambda: asyncio.run(run())
+
+
+
+def mqtt_parse():
+    # a burst of retained score messages, parsed by wait_msg
+    client = new_client()
+    n = 500
+    burst = b"".join(publish_packet(b"pico-snake-mqtt/%d/score" % k, b"%d" % k, retain=True) for k in range(n))
+
+    async def run():
+        client._sock = FakeSocket(burst)
+        start = ticks_us()
+        while client._sock.rx or client._ilen:
+            await client.wait_msg()
+        return ticks_diff(ticks_us(), start) / n
+
+    return lambda: asyncio.run(run())
+
+
+BENCHMARKS = (
+    ("snake_step_len5", lambda: snake_step(5)),
+    ("snake_step_len50", lambda: snake_step(50)),
+    ("snake_step_len200", lambda: snake_step(200)),
+    ("food_reset_fill10", lambda: food_reset(0.1)),
+    ("food_reset_fill50", lambda: food_reset(0.5)),
+    ("food_reset_fill90", lambda: food_reset(0.9)),
+    ("game_tick_headless", lambda: game_tick(False)),
+    ("game_tick_render", lambda: game_tick(True)),
+    ("game_stats_cached", lambda: game_stats(False)),
+    ("game_stats_render", lambda: game_stats(True)),
+    ("lcd_show", lcd_show),
+    ("lcd_show_tile", lcd_show_tile),
+    ("mqtt_publish", mqtt_publish),
+    ("mqtt_parse", mqtt_parse),
+)
+
+
+def run(names):
+    results = {}
+    for name, setup in BENCHMARKS:
+        if names and not any(n in name for n in names):
+            continue
+        bench = setup()
+        best = None
+        for _ in range(ROUNDS):
+            gc.collect()
+            us = bench()
+            if best is None or us < best:
+                best = us
+        results[name] = best
+        print("%-20s %10.2f us" % (name, best))
+    return results
+
+
+def compare(results, baseline, threshold):
+    """print the change against baseline, returns the names that regressed"""
+    regressed = []
+    for name, _ in BENCHMARKS:
+        if name not in results or name not in baseline:
+            continue
+        change = results[name] / baseline[name] - 1
+        flag = ""
+        if change > threshold:
+            regressed.append(name)
+            flag = "  REGRESSION"
+        print("%-20s %10.2f us  baseline %10.2f us  %+6.1f%%%s" % (
+            name, results[name], baseline[name], change * 100, flag
+        ))
+    return regressed
+
+
+def main(args):
+    impl = sys.implementation.name
+    out = None
+    baseline_file = "bench/baseline-%s.json" % impl
+    save_baseline = False
+    threshold = DEFAULT_THRESHOLD
+    names = []
+    i = 0
+    try:
+        while i < len(args):
+            arg = args[i]
+            if arg == "--out":
+                i += 1
+                out = args[i]
+            elif arg == "--baseline":
+                i += 1
+                baseline_file = args[i]
+            elif arg == "--save-baseline":
+                save_baseline = True
+            elif arg == "--threshold":
+                i += 1
+                threshold = float(args[i])
+            elif arg.startswith("--"):
+                raise ValueError(arg)
+            else:
+                names.append(arg)
+            i += 1
+    except (IndexError, ValueError):
+        print("usage: bench/suite.py [--out FILE] [--baseline FILE] [--save-baseline] [--threshold F] [name ...]")
+        return 2
+
+    results = run(names)
+    report = {"implementation": impl, "version": sys.version, "unit": "us", "results": results}
+    if out is not None:
+        with open(out, "w") as f:
+            json.dump(report, f)
+    if save_baseline:
+        with open(baseline_file, "w") as f:
+            json.dump(report, f)
+        print("baseline saved to", baseline_file)
+        return 0
+
+    try:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+    except OSError:
+        print("no baseline in", baseline_file)
+        return 0
+    if baseline.get("implementation") != impl:
+        print("baseline is from", baseline.get("implementation"), "not comparing")
+        return 0
+    print()
+    regressed = compare(results, baseline["results"], threshold)
+    if regressed:
+        print("%d regressions over %d%%: %s" % (len(regressed), threshold * 100, " ".join(regressed)))
+        return 1
+    return 0
+
+
+sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,145 @@
+# Compact binary game state stream.
+#
+# Grid cells are encoded as their index y * grid_width + x: one byte per
+# cell on grids of up to 256 cells (the default 20x10 grid), two bytes
+# (big endian) on larger grids.
+#
+# Keyframe:  b"K" seq grid_width grid_height length food snake...
+#            grid dimensions and snake length as two bytes each (big
+#            endian), snake cells ordered from head to tail
+# Delta:     b"D" seq flags [head] [food]
+#            flags DELTA_HEAD: new head cell follows
+#                  DELTA_TAIL: tail cell was removed
+#                  DELTA_FOOD: food moved, new food cell follows
+#
+# seq increments by one (mod 256) with every frame so that subscribers can
+# detect lost messages and wait for the next keyframe.
+#
+# A message holds one or more frames back to back, so that frames produced
+# faster than they are published need not be dropped.
+from micropython import const
+
+DELTA_HEAD = const(1)
+DELTA_TAIL = const(2)
+DELTA_FOOD = const(4)
+
+
+class GamestateEncoder:
+    def __init__(self, grid_width, grid_height, keyframe_interval=20):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.keyframe_interval = keyframe_interval
+        self.cell_bytes = 1 if grid_width * grid_height <= 256 else 2
+        self.seq = 0
+        self.frames_since_keyframe = 0
+        self.buffer = bytearray(8 + (1 + grid_width * grid_height) * self.cell_bytes)
+
+    def keyframe_due(self):
+        return self.frames_since_keyframe >= self.keyframe_interval
+
+    def put_cell(self, i, cell):
+        if self.cell_bytes == 2:
+            self.buffer[i] = cell >> 8
+            i += 1
+        self.buffer[i] = cell & 0xFF
+        return i + 1
+
+    def next_seq(self):
+        seq = self.seq
+        self.seq = (seq + 1) & 0xFF
+        return seq
+
+    def keyframe(self, snake_cells, food_cell):
+        """Encode the full state. snake_cells iterates head to tail."""
+        buf = self.buffer
+        buf[0] = 0x4B  # "K"
+        buf[1] = self.next_seq()
+        buf[2] = self.grid_width >> 8
+        buf[3] = self.grid_width & 0xFF
+        buf[4] = self.grid_height >> 8
+        buf[5] = self.grid_height & 0xFF
+        i = self.put_cell(8, food_cell)
+        length = 0
+        for cell in snake_cells:
+            i = self.put_cell(i, cell)
+            length += 1
+        buf[6] = length >> 8
+        buf[7] = length & 0xFF
+        self.frames_since_keyframe = 0
+        return bytes(buf[:i])
+
+    def delta(self, head_cell=None, tail_removed=False, food_cell=None):
+        """Encode a change relative to the previous frame."""
+        buf = self.buffer
+        buf[0] = 0x44  # "D"
+        buf[1] = self.next_seq()
+        flags = 0
+        i = 3
+        if head_cell is not None:
+            flags |= DELTA_HEAD
+            i = self.put_cell(i, head_cell)
+        if tail_removed:
+            flags |= DELTA_TAIL
+        if food_cell is not None:
+            flags |= DELTA_FOOD
+            i = self.put_cell(i, food_cell)
+        buf[2] = flags
+        self.frames_since_keyframe += 1
+        return bytes(buf[:i])
+
+
+class GamestateDecoder:
+    """Rebuilds the game state from a stream of keyframes and deltas.
+
+    After a lost or out of order frame the state is invalid until the next
+    keyframe arrives.
+    """
+
+    def __init__(self):
+        self.valid = False
+        self.seq = 0
+        self.grid_width = 0
+        self.grid_height = 0
+        self.cell_bytes = 1
+        self.food = None
+        self.snake = []  # (x, y) tuples, head first
+
+    def get_cell(self, data, i):
+        cell = data[i]
+        if self.cell_bytes == 2:
+            cell = cell << 8 | data[i + 1]
+        return (cell % self.grid_width, cell // self.grid_width), i + self.cell_bytes
+
+    def feed(self, data):
+        """Apply one message. Returns True if the state is now valid."""
+        i = 0
+        while i < len(data):
+            if data[i] == 0x4B:  # "K"
+                self.grid_width = data[i + 2] << 8 | data[i + 3]
+                self.grid_height = data[i + 4] << 8 | data[i + 5]
+                self.cell_bytes = 1 if self.grid_width * self.grid_height <= 256 else 2
+                length = data[i + 6] << 8 | data[i + 7]
+                self.seq = data[i + 1]
+                self.food, i = self.get_cell(data, i + 8)
+                snake = []
+                for _ in range(length):
+                    pos, i = self.get_cell(data, i)
+                    snake.append(pos)
+                self.snake = snake
+                self.valid = True
+            elif data[i] == 0x44 and self.valid and data[i + 1] == (self.seq + 1) & 0xFF:  # "D"
+                self.seq = data[i + 1]
+                flags = data[i + 2]
+                i += 3
+                if flags & DELTA_HEAD:
+                    pos, i = self.get_cell(data, i)
+                    self.snake.insert(0, pos)
+                if flags & DELTA_TAIL and len(self.snake) > 1:
+                    self.snake.pop()
+                if flags & DELTA_FOOD:
+                    self.food, i = self.get_cell(data, i)
+            else:
+                # unknown, lost or out of order frame
+                self.valid = False
+                return False
+        return self.valid
@@ -0,0 +1,64 @@
+# Garbage collection on a budget. Instead of gc.collect() on every game step,
+# collect in idle windows, such as right after a frame went out, once enough
+# has been allocated since the last collection. Anything beyond that is left
+# to the automatic collection that gc.threshold() sets up.
+#
+# Time spent in collect() is summed up per second and can be reported, e.g.
+# published over MQTT to watch for regressions. Automatic collections happen
+# inside allocations and are not timed.
+import gc
+from utime import ticks_ms, ticks_us, ticks_diff
+
+
+class GcBudget:
+    def __init__(self, threshold=24 * 1024, idle_threshold=4 * 1024, report=None):
+        """
+        :param threshold: Bytes allocated since the last collection after
+            which the allocator collects by itself, see gc.threshold().
+
+        :param idle_threshold: Bytes allocated since the last collection
+            after which idle() collects.
+
+        :param report: Called once per second with the microseconds spent
+            in collect() during that second.
+        """
+        self.idle_threshold = idle_threshold
+        self.report = report
+        gc.threshold(threshold)
+
+        self.alloc_after_collect = gc.mem_alloc()
+        self.collections = 0
+        self.gc_us_total = 0
+        self.gc_us_per_s = 0  # during the last full second
+        self.gc_us = 0  # during the current second
+        self.second_start = ticks_ms()
+
+    def collect(self):
+        start = ticks_us()
+        gc.collect()
+        spent = ticks_diff(ticks_us(), start)
+        self.alloc_after_collect = gc.mem_alloc()
+        self.collections += 1
+        self.gc_us += spent
+        self.gc_us_total += spent
+
+    def idle(self):
+        """
+        Call when there is time to spare. Collects if at least
+        idle_threshold bytes were allocated since the last collection.
+        """
+        allocated = gc.mem_alloc()
+        if allocated < self.alloc_after_collect:
+            # an automatic collection ran in the meantime
+            self.alloc_after_collect = allocated
+        elif allocated - self.alloc_after_collect >= self.idle_threshold:
+            self.collect()
+
+        now = ticks_ms()
+        elapsed = ticks_diff(now, self.second_start)
+        if elapsed >= 1000:
+            self.gc_us_per_s = self.gc_us * 1000 // elapsed
+            self.gc_us = 0
+            self.second_start = now
+            if self.report is not None:
+                self.report(self.gc_us_per_s)
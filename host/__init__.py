@@ -0,0 +1,19 @@
+# Stand-ins for the MicroPython modules the game and mqtt_as.py import, so that
+# Game, LCD_1inch14 and MQTTClient run unmodified under CPython. Importing this
+# package installs them in sys.modules; import it before any of the game or
+# MQTT modules. host.sim builds and runs a headless game on top of them.
+#
+# Under the MicroPython unix port only machine and network are replaced, it
+# has everything else but the board. Modules in sys.modules are found before
+# the built-in ones.
+import sys
+
+if sys.implementation.name == "micropython":
+    from . import machine, network
+
+    sys.modules["machine"] = machine
+    sys.modules["network"] = network
+else:
+    from ._cpython import install
+
+    install()
@@ -0,0 +1,43 @@
+# Installs the stand-ins under CPython, see __init__.py.
+import binascii
+import errno
+import gc
+import socket
+import struct
+import sys
+import types
+
+from . import framebuf, machine, network, uasyncio, utime
+
+
+def _module(name, **attrs):
+    mod = types.ModuleType(name)
+    mod.__dict__.update(attrs)
+    return mod
+
+
+def _copy(name, mod):
+    return _module(name, **{k: getattr(mod, k) for k in dir(mod) if not k.startswith("__")})
+
+
+def install():
+    # MicroPython's gc additions. There is no heap to measure, so the
+    # allocation count stays at 0 and only explicit gc.collect() calls collect.
+    if not hasattr(gc, "mem_alloc"):
+        gc.mem_alloc = lambda: 0
+        gc.mem_free = lambda: 0
+        gc.threshold = lambda *_: -1
+
+    for name, mod in (
+        ("micropython", _module("micropython", const=lambda x: x)),
+        ("uasyncio", uasyncio),
+        ("utime", utime),
+        ("framebuf", framebuf),
+        ("machine", machine),
+        ("network", network),
+        ("usocket", _copy("usocket", socket)),
+        ("ustruct", _copy("ustruct", struct)),
+        ("ubinascii", _module("ubinascii", hexlify=binascii.hexlify)),
+        ("uerrno", _module("uerrno", EINPROGRESS=errno.EINPROGRESS, ETIMEDOUT=errno.ETIMEDOUT)),
+    ):
+        sys.modules.setdefault(name, mod)
@@ -0,0 +1,70 @@
+# Turns a TickProfiler.dump() into Chrome trace events, to be opened in
+# chrome://tracing or https://ui.perfetto.dev. Every tick becomes a slice with
+# its phases nested inside it, in the order they happened.
+#
+#   python -m host.chrome_trace perf.txt trace.json
+import json
+import sys
+
+# ticks_us() on MicroPython wraps around at 2**30
+TICKS_PERIOD = 1 << 30
+
+
+def convert(lines):
+    """trace events, as a dict ready for json.dump(), from the lines of a dump"""
+    lines = iter(lines)
+    header = next(lines).split()
+    if header[:2] != ["#", "tickprof"]:
+        raise ValueError("not a TickProfiler dump")
+    names = header[2:]
+
+    events = []
+    now = None  # microseconds since the first event, unwrapped
+    previous = None
+    tick_start = None
+    last = None  # time of the previous event
+    for line in lines:
+        if not line.strip():
+            continue
+        phase, ticks = (int(field) for field in line.split())
+        if previous is None:
+            now = 0
+        else:
+            now += (ticks - previous) % TICKS_PERIOD
+        previous = ticks
+
+        if phase == -1:
+            events.append(tick_event(tick_start, last))
+            tick_start = last = now
+        elif tick_start is not None:
+            # the phase ran from the previous event up to now
+            events.append({
+                "name": names[phase], "ph": "X", "ts": last, "dur": now - last, "pid": 1, "tid": 1,
+            })
+            last = now
+    events.append(tick_event(tick_start, last))
+    return {"traceEvents": [event for event in events if event is not None], "displayTimeUnit": "ms"}
+
+
+def tick_event(start, end):
+    if start is None:
+        return None
+    return {"name": "tick", "ph": "X", "ts": start, "dur": end - start, "pid": 1, "tid": 1}
+
+
+def main(args):
+    if len(args) not in (1, 2):
+        print("usage: python -m host.chrome_trace DUMP [TRACE_JSON]")
+        return 2
+    with open(args[0]) as f:
+        trace = convert(f)
+    if len(args) == 2:
+        with open(args[1], "w") as f:
+            json.dump(trace, f)
+    else:
+        json.dump(trace, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
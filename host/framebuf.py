@@ -0,0 +1,130 @@
+# framebuf in pure Python, RGB565 only.
+
+RGB565 = 1
+
+
+class FrameBuffer:
+    """framebuf.FrameBuffer for RGB565 only, pixels stored little endian like
+    on the device. Ellipses are rasterized like modframebuf.c does. text()
+    only marks the area the text would cover, there is no font."""
+
+    def __init__(self, buf, width, height, fmt, stride=None):
+        self.buf = buf
+        self.width = width
+        self.height = height
+        self.stride = width if stride is None else stride
+
+    def _color(self, c):
+        return bytes((c & 0xFF, c >> 8 & 0xFF))
+
+    def fill(self, c):
+        self.fill_rect(0, 0, self.width, self.height, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.width), min(y + h, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        row = self._color(c) * (x1 - x0)
+        for yy in range(y0, y1):
+            i = (yy * self.stride + x0) * 2
+            self.buf[i : i + len(row)] = row
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+        else:
+            self.fill_rect(x, y, w, 1, c)
+            self.fill_rect(x, y + h - 1, w, 1, c)
+            self.fill_rect(x, y, 1, h, c)
+            self.fill_rect(x + w - 1, y, 1, h, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        i = (y * self.stride + x) * 2
+        if c is None:
+            return self.buf[i] | self.buf[i + 1] << 8
+        self.buf[i : i + 2] = self._color(c)
+
+    def line(self, x1, y1, x2, y2, c):
+        dx, dy = abs(x2 - x1), -abs(y2 - y1)
+        sx, sy = (1 if x1 < x2 else -1), (1 if y1 < y2 else -1)
+        err = dx + dy
+        while True:
+            self.pixel(x1, y1, c)
+            if x1 == x2 and y1 == y2:
+                return
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x1 += sx
+            if e2 <= dx:
+                err += dx
+                y1 += sy
+
+    def _ellipse_points(self, cx, cy, x, y, c, f):
+        if f:
+            self.fill_rect(cx, cy - y, x + 1, 1, c)
+            self.fill_rect(cx - x, cy - y, x + 1, 1, c)
+            self.fill_rect(cx - x, cy + y, x + 1, 1, c)
+            self.fill_rect(cx, cy + y, x + 1, 1, c)
+        else:
+            for px, py in ((cx + x, cy - y), (cx - x, cy - y), (cx - x, cy + y), (cx + x, cy + y)):
+                self.pixel(px, py, c)
+
+    def ellipse(self, cx, cy, xr, yr, c, f=False, m=0xF):
+        two_asquare, two_bsquare = 2 * xr * xr, 2 * yr * yr
+        x, y = xr, 0
+        xchange, ychange = yr * yr * (1 - 2 * xr), xr * xr
+        error, stoppingx, stoppingy = 0, two_bsquare * xr, 0
+        while stoppingx >= stoppingy:
+            self._ellipse_points(cx, cy, x, y, c, f)
+            y += 1
+            stoppingy += two_asquare
+            error += ychange
+            ychange += two_asquare
+            if 2 * error + xchange > 0:
+                x -= 1
+                stoppingx -= two_bsquare
+                error += xchange
+                xchange += two_bsquare
+        x, y = 0, yr
+        xchange, ychange = yr * yr, xr * xr * (1 - 2 * yr)
+        error, stoppingx, stoppingy = 0, 0, two_asquare * yr
+        while stoppingx <= stoppingy:
+            self._ellipse_points(cx, cy, x, y, c, f)
+            x += 1
+            stoppingx += two_bsquare
+            error += xchange
+            xchange += two_bsquare
+            if 2 * error + ychange > 0:
+                y -= 1
+                stoppingy -= two_asquare
+                error += ychange
+                ychange += two_asquare
+
+    def text(self, s, x, y, c=1):
+        self.fill_rect(x, y, 8 * len(s), 8, c)
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + fbuf.width, self.width), min(y + fbuf.height, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        n = (x1 - x0) * 2
+        for yy in range(y0, y1):
+            i = (yy * self.stride + x0) * 2
+            j = ((yy - y) * fbuf.stride + x0 - x) * 2
+            if key == -1:
+                self.buf[i : i + n] = fbuf.buf[j : j + n]
+            else:
+                for k in range(0, n, 2):
+                    if fbuf.buf[j + k] | fbuf.buf[j + k + 1] << 8 != key:
+                        self.buf[i + k : i + k + 2] = fbuf.buf[j + k : j + k + 2]
@@ -0,0 +1,62 @@
+# machine: pins, SPI and PWM that do nothing, and the board's unique ID.
+
+
+def unique_id():
+    return b"\xe6\x61\x48\x64\xd3\x57\xa4\x37"
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    IRQ_FALLING = 4
+
+    def __init__(self, id, *_, **__):
+        self.id = id
+        self.level = 1
+        self.handler = None
+
+    def __call__(self, v=None):
+        return self.value(v)
+
+    def value(self, v=None):
+        if v is None:
+            return self.level
+        self.level = v
+
+    def irq(self, trigger=None, handler=None):
+        self.handler = handler
+
+
+class SPI:
+    """Swallows everything written to it. Replace lcd.spi to look at the data."""
+
+    def __init__(self, *_, **__):
+        pass
+
+    def write(self, buf):
+        pass
+
+
+class PWM:
+    def __init__(self, *_):
+        pass
+
+    def freq(self, *_):
+        pass
+
+    def duty_u16(self, *_):
+        pass
+
+
+class Mem:
+    """machine.mem32 that reads every register as 0 and ignores writes."""
+
+    def __getitem__(self, addr):
+        return 0
+
+    def __setitem__(self, addr, v):
+        pass
+
+
+mem32 = Mem()
@@ -0,0 +1,32 @@
+# network: a WLAN interface that is always connected.
+
+STA_IF = 0
+STAT_CONNECTING = 1
+
+
+class WLAN:
+    def __init__(self, *_):
+        self._active = False
+
+    def active(self, *v):
+        if v:
+            self._active = v[0]
+        return self._active
+
+    def isconnected(self):
+        return True
+
+    def connect(self, *_):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def config(self, **_):
+        pass
+
+    def status(self):
+        return 3
+
+    def ifconfig(self):
+        return ("127.0.0.1", "255.0.0.0", "127.0.0.1", "127.0.0.1")
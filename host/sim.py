@@ -0,0 +1,83 @@
+# Headless games under CPython: the real Game, LCD_1inch14 and SnakePubsubber
+# on top of the stand-ins from this package, steered by a simple autopilot and
+# stepped back to back instead of on Game.tick's schedule.
+#
+#   from host import sim
+#   game, seconds = sim.simulate(10_000)
+import asyncio
+import random
+
+from utime import ticks_us, ticks_diff
+
+from lcd1in14 import LCD_1inch14
+from pubsubber import SnakePubsubber
+from snake import Game, GAMESTATE_SHOW_SCORE, KEY_NONE, KEY_UP, KEY_DOWN, KEY_LEFT, KEY_RIGHT
+
+# key, x and y direction
+MOVES = (
+    (KEY_UP, 0, -1),
+    (KEY_DOWN, 0, 1),
+    (KEY_LEFT, -1, 0),
+    (KEY_RIGHT, 1, 0),
+)
+
+
+def new_game(seed=1, render=False, player="A", grid_width=20, grid_height=10, tile_size=12, **kwargs):
+    """
+    A Game like main.py sets up, with food placed by a random.Random(seed)
+    unless an rng is given. The pubsubber has no MQTT client, published
+    values stay in its mailboxes. Further keyword arguments are passed on
+    to Game.
+    """
+    pubsubber = SnakePubsubber(mqtt_client=None, topic_prefix="pico-snake-mqtt", player_name_self=player)
+    if "rng" not in kwargs:
+        # MicroPython's random has no Random class, so only make one if needed
+        kwargs["rng"] = random.Random(seed)
+    return Game(grid_width, grid_height, tile_size, LCD_1inch14(), pubsubber, render=render, **kwargs)
+
+
+def autopilot(game):
+    """
+    The key that takes the snake one cell closer to the food without running
+    into itself, KEY_NONE if it is trapped.
+    """
+    snake = game.snake
+    width, height = game.grid_width, game.grid_height
+    y, x = divmod(snake.head(), width)
+    food_y, food_x = divmod(game.food.cell, width)
+    best, best_distance = KEY_NONE, None
+    for key, x_dir, y_dir in MOVES:
+        if snake.moving() and (x_dir, y_dir) == (-snake.direction.xdir, -snake.direction.ydir):
+            continue
+        new_x, new_y = (x + x_dir) % width, (y + y_dir) % height
+        if snake.contains_cell(snake.cell(new_x, new_y)):
+            continue
+        dx, dy = abs(food_x - new_x), abs(food_y - new_y)
+        distance = min(dx, width - dx) + min(dy, height - dy)
+        if best_distance is None or distance < best_distance:
+            best, best_distance = key, distance
+    return best
+
+
+async def run(game, steps, pilot=autopilot):
+    """
+    Run steps game steps without waiting in between. Before each step,
+    pilot(game) is asked for a key to press, unless pilot is None.
+    """
+    for _ in range(steps):
+        if pilot is not None and game.state != GAMESTATE_SHOW_SCORE:
+            key = pilot(game)
+            if key != KEY_NONE:
+                game.inputs.put(key)
+        await game.step()
+
+
+def simulate(steps, pilot=autopilot, **kwargs):
+    """
+    Create a game with new_game(**kwargs) and run it for steps steps.
+    Returns the game and the seconds it took.
+    """
+    game = new_game(**kwargs)
+    start = ticks_us()
+    asyncio.run(run(game, steps, pilot))
+    return game, ticks_diff(ticks_us(), start) / 1000000
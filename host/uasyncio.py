@@ -0,0 +1,82 @@
+# uasyncio on top of asyncio. MicroPython's additions to asyncio (sleep_ms,
+# wait_for_ms, ThreadSafeFlag) are also patched into asyncio itself, as code
+# for newer MicroPython versions imports asyncio directly.
+import asyncio
+from asyncio import *  # noqa: F401,F403
+
+
+async def sleep_ms(ms):
+    await asyncio.sleep(ms / 1000)
+
+
+async def wait_for_ms(aw, ms):
+    return await asyncio.wait_for(aw, ms / 1000)
+
+
+async def _ready(sock, write):  # Await socket readiness like uasyncio's I/O queue
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+    fd = sock.fileno()
+    (loop.add_writer if write else loop.add_reader)(fd, lambda: fut.done() or fut.set_result(None))
+    try:
+        await fut
+    finally:
+        (loop.remove_writer if write else loop.remove_reader)(fd)
+
+
+class Stream:
+    """uasyncio.Stream as found in MicroPython: wraps a non-blocking socket."""
+
+    def __init__(self, s, e={}):
+        self.s = s
+        self.e = e
+        self.out_buf = b""
+
+    async def readinto(self, buf):
+        await _ready(self.s, False)
+        return self.s.readinto(buf)
+
+    def write(self, buf):
+        if not self.out_buf:
+            ret = self.s.write(buf)
+            if ret == len(buf):
+                return
+            if ret is not None:
+                buf = buf[ret:]
+        self.out_buf += buf
+
+    async def drain(self):
+        mv = memoryview(self.out_buf)
+        off = 0
+        while off < len(mv):
+            await _ready(self.s, True)
+            ret = self.s.write(mv[off:])
+            if ret is not None:
+                off += ret
+        self.out_buf = b""
+
+
+StreamReader = StreamWriter = Stream
+
+
+class ThreadSafeFlag:
+    """uasyncio.ThreadSafeFlag, for flags set from the event loop thread."""
+
+    def __init__(self):
+        self._event = asyncio.Event()
+
+    def set(self):
+        self._event.set()
+
+    def clear(self):
+        self._event.clear()
+
+    async def wait(self):
+        await self._event.wait()
+        self._event.clear()
+
+
+if not hasattr(asyncio, "sleep_ms"):
+    asyncio.sleep_ms = sleep_ms
+    asyncio.wait_for_ms = wait_for_ms
+    asyncio.ThreadSafeFlag = ThreadSafeFlag
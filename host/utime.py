@@ -0,0 +1,26 @@
+# utime: the ticks functions, with ticks that never wrap around.
+from time import monotonic_ns, sleep, time  # noqa: F401
+
+
+def ticks_ms():
+    return monotonic_ns() // 1_000_000
+
+
+def ticks_us():
+    return monotonic_ns() // 1_000
+
+
+def ticks_diff(a, b):
+    return a - b
+
+
+def ticks_add(a, b):
+    return a + b
+
+
+def sleep_ms(ms):
+    sleep(ms / 1000)
+
+
+def sleep_us(us):
+    sleep(us / 1_000_000)
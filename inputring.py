@@ -0,0 +1,50 @@
+# Queue of key presses from the joystick interrupt handlers to the game loop.
+#
+# A fixed size ring of key codes and ticks_us() timestamps. put() is called
+# from the interrupt handler and only ever moves head, get() is called from
+# the game loop and only ever moves tail, so the two need no locking, and
+# put() allocates nothing so it is safe in a hard IRQ.
+from array import array
+from utime import ticks_us
+
+
+class InputRing:
+    def __init__(self, size=8):
+        """
+        :param size: Number of presses that can wait, a power of two of at
+            most 128. Presses arriving while the ring is full are dropped.
+        """
+        self.keys = bytearray(size)
+        self.times = array("L", (0 for _ in range(size)))
+        self.mask = size - 1
+        self.size = size
+        # head and tail count modulo 256, the slot is the count & mask
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+        self.time = 0  # ticks_us() of the press get() returned last
+
+    def put(self, key):
+        head = self.head
+        if (head - self.tail) & 0xFF >= self.size:
+            self.dropped += 1
+            return
+        self.keys[head & self.mask] = key
+        self.times[head & self.mask] = ticks_us()
+        self.head = (head + 1) & 0xFF
+
+    def pending(self):
+        return self.head != self.tail
+
+    def get(self):
+        """Return the oldest key press and remove it, 0 if there is none."""
+        tail = self.tail
+        if tail == self.head:
+            return 0
+        key = self.keys[tail & self.mask]
+        self.time = self.times[tail & self.mask]
+        self.tail = (tail + 1) & 0xFF
+        return key
+
+    def clear(self):
+        self.tail = self.head
@@ -1,5 +1,14 @@
 from machine import Pin, SPI, PWM
+from micropython import const
 import framebuf
+import uasyncio as asyncio
+from utime import ticks_us, ticks_diff
+
+try:
+    import rp2
+    from machine import mem32
+except ImportError:  # no DMA on this port
+    rp2 = None
 
 BL = 13
 DC = 8
@@ -8,6 +17,47 @@ MOSI = 11
 SCK = 10
 CS = 9
 
+# position of the visible 240x135 area in the controller's frame memory
+X_OFFSET = const(40)
+Y_OFFSET = const(53)
+
+# bytes sent between yields to the event loop by show_async()
+SHOW_CHUNK = const(4096)
+
+# RP2040 SPI1 registers and its TX DMA request, for show_dma()
+SPI1_BASE = const(0x4003C000)
+SSPDR = const(0x008)
+SSPSR = const(0x00C)
+SSPICR = const(0x020)
+SSPSR_RNE = const(0x04)
+SSPSR_BSY = const(0x10)
+DREQ_SPI1_TX = const(18)
+
+# ST7789 init sequence: command, number of parameters, parameters
+INIT_SEQUENCE = (
+    b"\x36\x01\x70"  # MADCTL: memory access order
+    b"\x3A\x01\x05"  # COLMOD: 16 bit pixels
+    b"\xB2\x05\x0C\x0C\x00\x33\x33"  # PORCTRL: porch setting
+    b"\xB7\x01\x35"  # GCTRL: gate control
+    b"\xBB\x01\x19"  # VCOMS
+    b"\xC0\x01\x2C"  # LCMCTRL
+    b"\xC2\x01\x01"  # VDVVRHEN
+    b"\xC3\x01\x12"  # VRHS
+    b"\xC4\x01\x20"  # VDVS
+    b"\xC6\x01\x0F"  # FRCTRL2: 60 Hz
+    b"\xD0\x02\xA4\xA1"  # PWCTRL1
+    # PVGAMCTRL, NVGAMCTRL: gamma
+    b"\xE0\x0E\xD0\x04\x0D\x11\x13\x2B\x3F\x54\x4C\x18\x0D\x0B\x1F\x23"
+    b"\xE1\x0E\xD0\x04\x0C\x11\x13\x2C\x3F\x44\x51\x2F\x1F\x1F\x20\x23"
+    b"\x21\x00"  # INVON: inversion on
+    b"\x11\x00"  # SLPOUT: sleep out
+    b"\x29\x00"  # DISPON: display on
+)
+
+# CASET and RASET parameters for the whole visible area
+FULL_COLUMNS = bytes((0, X_OFFSET, (X_OFFSET + 239) >> 8, (X_OFFSET + 239) & 0xFF))
+FULL_ROWS = bytes((0, Y_OFFSET, 0, Y_OFFSET + 134))
+
 
 class LCD_1inch14(framebuf.FrameBuffer):
 
@@ -19,7 +69,14 @@ class LCD_1inch14(framebuf.FrameBuffer):
     keyDown = Pin(18 ,Pin.IN,Pin.PULL_UP)
     keyRight = Pin(20 ,Pin.IN,Pin.PULL_UP)
 
-    def __init__(self):
+    def __init__(self, dma=False, on_init=None):
+        """
+        :param dma: Let show_async() send the framebuffer by DMA where the
+            port supports it (rp2.DMA) instead of in chunks.
+
+        :param on_init: Called with the time init_display() took in
+            microseconds, for boot timing. The time is also kept in init_us.
+        """
         self.width = 240
         self.height = 135
 
@@ -40,8 +97,25 @@ class LCD_1inch14(framebuf.FrameBuffer):
         self.dc = Pin(DC,Pin.OUT)
         self.dc(1)
         self.buffer = bytearray(self.height * self.width * 2)
+        self.buffer_mv = memoryview(self.buffer)
+        self.window = bytearray(4)
+        self.byte = bytearray(1)
+        self.dirty = []  # (x, y, w, h) rectangles changed since the last flush
+
+        # DMA transfer state, see show_dma()
+        self.dma = None
+        self.flushing = False
+        self.flushed = None
+        if dma and rp2 is not None and hasattr(rp2, "DMA"):
+            self.dma = rp2.DMA()
+            self.dma.irq(self.dma_done)
+            self.flushed = asyncio.ThreadSafeFlag()
         super().__init__(self.buffer, self.width, self.height, framebuf.RGB565)
+        start = ticks_us()
         self.init_display()
+        self.init_us = ticks_diff(ticks_us(), start)
+        if on_init is not None:
+            on_init(self.init_us)
         
         self.red   =   0x07E0
         self.green =   0x001f
@@ -49,17 +123,26 @@ class LCD_1inch14(framebuf.FrameBuffer):
         self.white =   0xffff
         
     def write_cmd(self, cmd):
+        self.command(cmd)
+
+    def write_data(self, buf):
+        self.byte[0] = buf
         self.cs(1)
-        self.dc(0)
+        self.dc(1)
         self.cs(0)
-        self.spi.write(bytearray([cmd]))
+        self.spi.write(self.byte)
         self.cs(1)
 
-    def write_data(self, buf):
+    def command(self, cmd, params=None):
+        """send a command and its parameters, if any, in one transaction"""
+        self.byte[0] = cmd
         self.cs(1)
-        self.dc(1)
+        self.dc(0)
         self.cs(0)
-        self.spi.write(bytearray([buf]))
+        self.spi.write(self.byte)
+        if params is not None:
+            self.dc(1)
+            self.spi.write(params)
         self.cs(1)
 
     def init_display(self):
@@ -67,103 +150,166 @@ class LCD_1inch14(framebuf.FrameBuffer):
         self.rst(1)
         self.rst(0)
         self.rst(1)
-        
-        self.write_cmd(0x36)
-        self.write_data(0x70)
-
-        self.write_cmd(0x3A) 
-        self.write_data(0x05)
-
-        self.write_cmd(0xB2)
-        self.write_data(0x0C)
-        self.write_data(0x0C)
-        self.write_data(0x00)
-        self.write_data(0x33)
-        self.write_data(0x33)
-
-        self.write_cmd(0xB7)
-        self.write_data(0x35) 
-
-        self.write_cmd(0xBB)
-        self.write_data(0x19)
-
-        self.write_cmd(0xC0)
-        self.write_data(0x2C)
-
-        self.write_cmd(0xC2)
-        self.write_data(0x01)
-
-        self.write_cmd(0xC3)
-        self.write_data(0x12)   
-
-        self.write_cmd(0xC4)
-        self.write_data(0x20)
-
-        self.write_cmd(0xC6)
-        self.write_data(0x0F) 
-
-        self.write_cmd(0xD0)
-        self.write_data(0xA4)
-        self.write_data(0xA1)
-
-        self.write_cmd(0xE0)
-        self.write_data(0xD0)
-        self.write_data(0x04)
-        self.write_data(0x0D)
-        self.write_data(0x11)
-        self.write_data(0x13)
-        self.write_data(0x2B)
-        self.write_data(0x3F)
-        self.write_data(0x54)
-        self.write_data(0x4C)
-        self.write_data(0x18)
-        self.write_data(0x0D)
-        self.write_data(0x0B)
-        self.write_data(0x1F)
-        self.write_data(0x23)
-
-        self.write_cmd(0xE1)
-        self.write_data(0xD0)
-        self.write_data(0x04)
-        self.write_data(0x0C)
-        self.write_data(0x11)
-        self.write_data(0x13)
-        self.write_data(0x2C)
-        self.write_data(0x3F)
-        self.write_data(0x44)
-        self.write_data(0x51)
-        self.write_data(0x2F)
-        self.write_data(0x1F)
-        self.write_data(0x1F)
-        self.write_data(0x20)
-        self.write_data(0x23)
-        
-        self.write_cmd(0x21)
 
-        self.write_cmd(0x11)
+        sequence = memoryview(INIT_SEQUENCE)
+        i = 0
+        while i < len(sequence):
+            n = sequence[i + 1]
+            self.command(sequence[i], sequence[i + 2:i + 2 + n] if n else None)
+            i += 2 + n
+
+    def set_window(self, x, y, w, h):
+        """address a rectangle of the screen and start writing to it"""
+        window = self.window
+        start = X_OFFSET + x
+        end = start + w - 1
+        window[0] = start >> 8
+        window[1] = start & 0xFF
+        window[2] = end >> 8
+        window[3] = end & 0xFF
+        self.command(0x2A, window)
+        start = Y_OFFSET + y
+        end = start + h - 1
+        window[0] = start >> 8
+        window[1] = start & 0xFF
+        window[2] = end >> 8
+        window[3] = end & 0xFF
+        self.command(0x2B, window)
+        self.command(0x2C)
 
-        self.write_cmd(0x29)
+    def set_full_window(self):
+        """address the whole screen and start writing to it"""
+        self.command(0x2A, FULL_COLUMNS)
+        self.command(0x2B, FULL_ROWS)
+        self.command(0x2C)
 
     def show(self):
-        self.write_cmd(0x2A)
-        self.write_data(0x00)
-        self.write_data(0x28)
-        self.write_data(0x01)
-        self.write_data(0x17)
-        
-        self.write_cmd(0x2B)
-        self.write_data(0x00)
-        self.write_data(0x35)
-        self.write_data(0x00)
-        self.write_data(0xBB)
-        
-        self.write_cmd(0x2C)
+        self.set_full_window()
         
         self.cs(1)
         self.dc(1)
         self.cs(0)
         self.spi.write(self.buffer)
         self.cs(1)
+        self.dirty.clear()
+        return len(self.buffer)
+
+    async def show_async(self, chunk_size=SHOW_CHUNK):
+        """
+        Like show(), but let other tasks run during the transfer: by DMA if
+        enabled, otherwise in chunks of chunk_size bytes with a yield to the
+        event loop after each.
+        """
+        if self.dma is not None:
+            await self.wait_flushed()  # a transfer started by show_dma()
+        if self.show_dma():
+            await self.wait_flushed()
+            return len(self.buffer)
+
+        self.set_full_window()
+
+        self.cs(1)
+        self.dc(1)
+        self.cs(0)
+        for start in range(0, len(self.buffer), chunk_size):
+            self.spi.write(self.buffer_mv[start:start + chunk_size])
+            await asyncio.sleep_ms(0)
+        self.cs(1)
+        self.dirty.clear()
+        return len(self.buffer)
+
+    def show_dma(self):
+        """
+        Start sending the whole framebuffer by DMA and return at once, or
+        return False without sending anything if DMA is not enabled. The
+        framebuffer must not change until self.flushed is set.
+
+        Raises RuntimeError if the previous transfer is still running, see
+        wait_flushed().
+        """
+        if self.dma is None:
+            return False
+        if self.flushing:
+            raise RuntimeError("DMA transfer still running")
+        self.set_full_window()
+
+        self.cs(1)
+        self.dc(1)
+        self.cs(0)
+        self.flushing = True
+        self.dirty.clear()
+        self.start_dma()
+        return True
+
+    async def wait_flushed(self):
+        """wait until no DMA transfer is running"""
+        # self.flushed may still be set by a transfer nobody waited for
+        while self.flushing:
+            await self.flushed.wait()
+
+    def start_dma(self):
+        ctrl = self.dma.pack_ctrl(size=0, inc_write=False, treq_sel=DREQ_SPI1_TX)
+        self.dma.config(
+            read=self.buffer, write=SPI1_BASE + SSPDR, count=len(self.buffer), ctrl=ctrl, trigger=True
+        )
+
+    def dma_done(self, dma):
+        # the last bytes may still be shifting out of the SPI FIFO
+        while mem32[SPI1_BASE + SSPSR] & SSPSR_BSY:
+            pass
+        # drop what was clocked in meanwhile, so the next SPI.write starts clean
+        while mem32[SPI1_BASE + SSPSR] & SSPSR_RNE:
+            mem32[SPI1_BASE + SSPDR]
+        mem32[SPI1_BASE + SSPICR] = 1  # clear receive overrun
+        self.cs(1)
+        self.flushing = False
+        self.flushed.set()
+
+    def show_region(self, x, y, w, h):
+        """
+        Send only the rectangle at x, y of size w, h to the screen, clipped
+        to the screen. Returns the number of pixel bytes sent.
+        """
+        if x < 0:
+            w += x
+            x = 0
+        if y < 0:
+            h += y
+            y = 0
+        w = min(w, self.width - x)
+        h = min(h, self.height - y)
+        if w <= 0 or h <= 0:
+            return 0
+
+        self.set_window(x, y, w, h)
+
+        stride = self.width * 2
+        start = y * stride + x * 2
+        self.cs(1)
+        self.dc(1)
+        self.cs(0)
+        if w == self.width:
+            # full rows are contiguous in the buffer
+            self.spi.write(self.buffer_mv[start:start + h * stride])
+        else:
+            row_bytes = w * 2
+            for _ in range(h):
+                self.spi.write(self.buffer_mv[start:start + row_bytes])
+                start += stride
+        self.cs(1)
+        return w * h * 2
+
+    def mark_dirty(self, x, y, w, h):
+        """remember a changed rectangle for the next show_dirty()"""
+        self.dirty.append((x, y, w, h))
+
+    def show_dirty(self):
+        """send the rectangles marked dirty. Returns the number of pixel bytes sent."""
+        sent = 0
+        for x, y, w, h in self.dirty:
+            sent += self.show_region(x, y, w, h)
+        self.dirty.clear()
+        return sent
 
     def keyAPressed(self):
         return self.keyA.value() == 0
@@ -1,19 +1,30 @@
 import uasyncio as asyncio
 import gc
+import random
 from sys import version as sys_version
 # import json
 
+from gcbudget import GcBudget
 from lcd1in14 import LCD_1inch14
 from mqtt_as import MQTTClient, config
+from profiler import TickProfiler
+from pubsubber import SnakePubsubber
+from replay import Recorder, Xorshift32
 from secrets import WLAN_SSID, WLAN_PASSWORD
-from snake import Game
+from snake import Game, GAMESTATE_SHOW_SCORE
 from splashscreen import splashscreen
 
 # initialize the LCD screen
-LCD = LCD_1inch14()
+LCD = LCD_1inch14(on_init=lambda us: print(f"Display init: {us} us"))
 
 TOPIC_PREFIX = "pico-snake-mqtt"
 
+# file on flash to record the games to, for replay.Replayer. None to not record.
+RECORD_FILE = None
+# file on flash to write the TickProfiler events of the last ticks to when a
+# game ends, for host/chrome_trace.py. None to not write them.
+PROFILE_FILE = None
+
 # Who am I!? Saving ourselves an import by getting the default
 # client ID from mqtt_as which happens to be hexlify(unique_id())
 SNAKERPICOS = {
@@ -35,90 +46,38 @@ PLAYER2TEAM = {
     "F": "red",
 }
 
-class SnakePubsubber:
-    def __init__(self, mqtt_client, topic_prefix, player_name_self):
-        self.mqtt_client = mqtt_client
-        self.topic_prefix = topic_prefix
-        self.player_name_self = player_name_self
-
-        self.scores = {
-            "A": 0,
-            "B": 0,
-            "C": 0,
-            "D": 0,
-            "E": 0,
-            "F": 0,
-        }
-
-    async def subber(self):
-        if not self.mqtt_client.isconnected():
-            return
-        
-        await self.mqtt_client.subscribe(topic=f"{self.topic_prefix}/+/score")
-
-        async for topic, msg, _ in self.mqtt_client.queue:
-            topic_parts = topic.decode().split("/")
-            if (
-                len(topic_parts) == 3
-                and topic_parts[0] == self.topic_prefix
-                and topic_parts[1] != self.player_name_self
-                and topic_parts[2] == "score"
-            ):
-                try:
-                    # msg_parsed = json.loads(msg.decode())
-                    score = int(msg.decode())
-                except Exception as ex:
-                    print(f"Failed to decode arriving message: {msg}")
-                    continue
-                self.scores[topic_parts[1]] = score
-
-    async def publish_score_task(self, score):
-        # drop messages while offline instead of enqueueing them and 
-        # gobbling up memory with it
-        if not self.mqtt_client.isconnected():
-            return
-        
-        await self.mqtt_client.publish(
-            topic=f"{self.topic_prefix}/{self.player_name_self}/score", 
-            msg=f"{score}", 
-            retain=True,
-            qos=0,
-        )
-
-    async def publish_gamestate_task(self, payload):
-        # drop messages while offline instead of enqueueing them and 
-        # gobbling up memory with it
-        if not self.mqtt_client.isconnected():
-            return
-        
-        await self.mqtt_client.publish(
-            topic=f"{self.topic_prefix}/{self.player_name_self}/game", 
-            msg=payload, 
-            retain=True,
-            qos=0,
-        )
-
-    def report_score(self, score):
-        self.scores[self.player_name_self] = score
-        asyncio.create_task(self.publish_score_task(score))
-
-    def report_gamestate(self, state_str):
-        asyncio.create_task(self.publish_gamestate_task(state_str))
-
-
 async def snake(pubsubber):
     """run game loop"""
     # grid size 20 x 11 tiles with tile_size=12 => 240*132 px
-    game = Game(grid_width=20, grid_height=10, tile_size=12, lcd=LCD, pubsubber=pubsubber)
+    gc_budget = GcBudget(report=pubsubber.report_gc)
+    profiler = TickProfiler(report=pubsubber.report_perf)
+    rng = random
+    recorder = None
+    if RECORD_FILE is not None:
+        seed = random.getrandbits(32)
+        rng = Xorshift32(seed)
+        recorder = Recorder(open(RECORD_FILE, "wb"), seed, grid_width=20, grid_height=10)
+    game = Game(
+        grid_width=20, grid_height=10, tile_size=12, lcd=LCD, pubsubber=pubsubber, rng=rng,
+        gc_budget=gc_budget, recorder=recorder, profiler=profiler,
+    )
+    state = game.state
     while True:
         await game.tick()
+        if game.state != state:
+            state = game.state
+            if state == GAMESTATE_SHOW_SCORE and PROFILE_FILE is not None:
+                # on the score screen the time spent writing to flash is not missed
+                with open(PROFILE_FILE, "w") as f:
+                    profiler.dump(f)
 
 
 async def main():
     print(f"MicroPython version: {sys_version}")
     hex_uniq_id = config["client_id"]
     print(f"Unique ID: {hex_uniq_id}")
-    player_name = SNAKERPICOS.get(hex_uniq_id, hex_uniq_id[-4:])
+    # a str like the known names: it goes into topics, the stats bar and the scores
+    player_name = SNAKERPICOS.get(hex_uniq_id, hex_uniq_id[-4:].decode())
     print(f"Player Name: {player_name}")
     player_team = PLAYER2TEAM.get(player_name, "orange")
 
@@ -148,7 +107,9 @@ async def main():
             0,  # qos
         ),
         "keepalive": 5,
-        "queue_len": 1,  # Use event interface with default queue
+        "queue_len": 1,  # Use event interface
+        "queue_conflate": True,  # with latest score per player
+        "gc_collect": False,  # GcBudget in the game loop takes care of it
     })
 
     mqtt_client = MQTTClient(config)
@@ -197,7 +158,7 @@ async def main():
     tasks = [
         asyncio.create_task(snake(pubsubber)),
         asyncio.create_task(pubsubber.subber()),
-    ]
+    ] + pubsubber.publisher_tasks()
     await asyncio.gather(*tasks)
 
 asyncio.run(main())
\ No newline at end of file
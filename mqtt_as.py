@@ -30,6 +30,12 @@ VERSION = (0, 7, 0)
 # Default short delay for good SynCom throughput (avoid sleep(0) with SynCom).
 _DEFAULT_MS = const(20)
 _SOCKET_POLL_DELAY = const(5)  # 100ms added greatly to publish latency
+# Outgoing packets are assembled in a preallocated buffer of this size and
+# sent with a single write. Larger packets get a one-off buffer.
+_OBUF_SIZE = const(256)
+# Incoming data is read into a receive buffer of this size. Several packets
+# are framed per read; a packet that does not fit gets a one-off buffer.
+_IBUF_SIZE = const(512)
 
 # Legitimate errors while waiting on a socket. See uasyncio __init__.py open_connection().
 ESP32 = platform == "esp32"
@@ -79,6 +85,109 @@ class MsgQueue:
         return r
 
 
+# Keeps only the newest pending message per topic: a message replaces a
+# pending one for the same topic in place, so messages for different topics
+# never evict each other. Size is bounded by the number of distinct topics.
+# Topics are delivered in the order they first became pending.
+class ConflatingMsgQueue:
+    def __init__(self):
+        self._msgs = {}  # topic: (topic, msg, retained)
+        self._order = []  # Pending topics, oldest first
+        self._evt = asyncio.Event()
+        self.discards = 0  # Messages replaced by a newer one
+
+    def put(self, *v):
+        topic = v[0]
+        if topic in self._msgs:
+            self.discards += 1
+        else:
+            self._order.append(topic)
+        self._msgs[topic] = v
+        self._evt.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._order:  # Empty
+            self._evt.clear()
+            await self._evt.wait()
+        return self._msgs.pop(self._order.pop(0))
+
+
+# Dispatches incoming messages to handlers registered for topic filters,
+# which may contain + and # wildcards. Filters are compiled into a trie with
+# one node per topic level. Raw topic bytes are matched level by level
+# without decoding; literal levels are looked up in a dict per node, so the
+# cost per message does not depend on the number of filters.
+class TopicRouter:
+    def __init__(self):
+        self._root = _TrieNode()
+
+    # handler(topic, msg, retained, *wildcards) is called for every message
+    # matching topic_filter, with the topic level matched by each + and the
+    # remainder of the topic matched by # (empty if none).
+    def add(self, topic_filter, handler):
+        node = self._root
+        levels = _as_bytes(topic_filter).split(b"/")
+        for k, level in enumerate(levels):
+            if level == b"#":
+                if k != len(levels) - 1:
+                    raise ValueError("# must be the last level.")
+                node.hash.append(handler)
+                return
+            if level == b"+":
+                if node.plus is None:
+                    node.plus = _TrieNode()
+                node = node.plus
+                continue
+            child = node.lits.get(level)
+            if child is None:
+                child = node.lits[level] = _TrieNode()
+            node = child
+        node.handlers.append(handler)
+
+    # Call the handlers of all filters matching topic. Returns the number of
+    # handlers called.
+    def route(self, topic, msg, retained=False):
+        if not isinstance(topic, bytes):
+            topic = bytes(topic)  # memoryview from subs_cb
+        # Wildcards don't match topics starting with $ at the first level
+        return self._match(self._root, topic, 0, (), msg, retained, topic.startswith(b"$"))
+
+    # i is the index of the current topic level, -1 once all are consumed.
+    def _match(self, node, topic, i, wild, msg, retained, sys=False):
+        n = 0
+        if node.hash and not sys:
+            rest = topic[i:] if i >= 0 else b""
+            for handler in node.hash:
+                handler(topic, msg, retained, *wild, rest)
+                n += 1
+        if i < 0:
+            for handler in node.handlers:
+                handler(topic, msg, retained, *wild)
+                n += 1
+            return n
+        j = topic.find(b"/", i)
+        end = len(topic) if j < 0 else j
+        nxt = -1 if j < 0 else j + 1
+        if node.lits:
+            child = node.lits.get(topic[i:end])
+            if child is not None:
+                n += self._match(child, topic, nxt, wild, msg, retained)
+        if node.plus is not None and not sys:
+            n += self._match(node.plus, topic, nxt, wild + (topic[i:end],), msg, retained)
+        return n
+
+
+class _TrieNode:
+    def __init__(self):
+        self.lits = {}  # level: _TrieNode for literal topic levels
+        self.plus = None  # _TrieNode for a + wildcard
+        self.hash = []  # Handlers of filters ending in # here
+        self.handlers = []  # Handlers of filters ending here
+
+
 config = {
     "client_id": hexlify(unique_id()),
     "server": None,
@@ -93,6 +202,7 @@ config = {
     "clean_init": True,
     "clean": True,
     "max_repubs": 4,
+    "max_inflight": 8,  # Max qos 1 publications awaiting PUBACK
     "will": None,
     "subs_cb": lambda *_: None,
     "wifi_coro": eliza,
@@ -100,6 +210,11 @@ config = {
     "ssid": None,
     "wifi_pw": None,
     "queue_len": 0,
+    "queue_conflate": False,  # Event queue keeps newest message per topic only
+    # False: poll sockets with sleep_ms. ESP32 and RP2 sockets raise BUSY_ERRORS
+    # the uasyncio stream can't recover from, it loses track of what was sent.
+    "stream_io": not (ESP32 or RP2),
+    "gc_collect": True,  # False: application runs gc, not _keep_connected
 }
 
 
@@ -107,6 +222,17 @@ class MQTTException(Exception):
     pass
 
 
+# A qos 1 publication awaiting PUBACK.
+class InFlight:
+    def __init__(self, topic, msg, retain):
+        self.topic = topic
+        self.msg = msg
+        self.retain = retain
+        self.t = ticks_ms()  # Time of last (re)publication
+        self.count = 0  # Number of republications, -1 on failure
+        self.done = asyncio.Event()
+
+
 def pid_gen():
     pid = 0
     while True:
@@ -119,6 +245,53 @@ def qos_check(qos):
         raise ValueError("Only qos 0 and 1 are supported.")
 
 
+# Packet assembly helpers. Each writes into buf at index i and returns the
+# index of the next free byte.
+def _put_len(buf, i, sz):  # MQTT variable length "remaining length" field
+    while sz > 0x7F:
+        buf[i] = (sz & 0x7F) | 0x80
+        sz >>= 7
+        i += 1
+    buf[i] = sz
+    return i + 1
+
+
+def _put_str(buf, i, s):  # 2 byte length prefix followed by data
+    n = len(s)
+    buf[i] = n >> 8
+    buf[i + 1] = n & 0xFF
+    i += 2
+    buf[i : i + n] = s
+    return i + n
+
+
+def _len_len(sz):  # Number of bytes needed to encode remaining length sz
+    n = 1
+    while sz > 0x7F:
+        sz >>= 7
+        n += 1
+    return n
+
+
+def _get_len(buf, i, end):  # Decode remaining length at buf[i]
+    n = 0
+    sh = 0
+    while i < end:
+        b = buf[i]
+        i += 1
+        n |= (b & 0x7F) << sh
+        if not b & 0x80:
+            return n, i  # Length and index of first byte after it
+        sh += 7
+        if sh > 21:
+            raise OSError(-1, "Invalid remaining length")
+    return None  # Incomplete
+
+
+def _as_bytes(s):  # Topics and payloads may be passed as str
+    return s.encode() if isinstance(s, str) else s
+
+
 # MQTT_base class. Handles MQTT protocol on the basis of a good connection.
 # Exceptions from connectivity failures are handled by MQTTClient subclass.
 class MQTT_base:
@@ -152,7 +325,10 @@ class MQTT_base:
         if self._events:
             self.up = asyncio.Event()
             self.down = asyncio.Event()
-            self.queue = MsgQueue(config["queue_len"])
+            if config["queue_conflate"]:
+                self.queue = ConflatingMsgQueue()
+            else:
+                self.queue = MsgQueue(config["queue_len"])
         else:  # Callbacks
             self._cb = config["subs_cb"]
             self._wifi_handler = config["wifi_coro"]
@@ -165,20 +341,34 @@ class MQTT_base:
         if self.server is None:
             raise ValueError("no server specified.")
         self._sock = None
+        self._stream_io = config["stream_io"]
+        self._gc_collect = config["gc_collect"]
+        self._stream = None  # uasyncio stream wrapping ._sock if ._stream_io
         self._sta_if = network.WLAN(network.STA_IF)
         self._sta_if.active(True)
 
         self.newpid = pid_gen()
-        self.rcv_pids = set()  # PUBACK and SUBACK pids awaiting ACK response
+        self.rcv_pids = set()  # SUBACK and UNSUBACK pids awaiting ACK response
+        self._max_inflight = config["max_inflight"]
+        self._inflight = {}  # pid: InFlight for qos 1 publications awaiting PUBACK
+        self._sending = 0  # qos 1 publications in the window not sent yet
+        self._acked = asyncio.Event()  # A PUBACK arrived: room in the window
+        self._timer = asyncio.Event()  # Wakes ._republish() on new publication
         self.last_rx = ticks_ms()  # Time of last communication from broker
+        # Inbound and outbound traffic are serialised independently: .lock is
+        # held while writing a packet, .rlock while parsing received data.
         self.lock = asyncio.Lock()
+        self.rlock = asyncio.Lock()
+        self._obuf = bytearray(_OBUF_SIZE)  # Reused for outgoing packets
+        self._ibv = memoryview(bytearray(_IBUF_SIZE))  # Receive buffer
+        self._ilen = 0  # Number of unprocessed bytes in receive buffer
 
     def _set_last_will(self, topic, msg, retain=False, qos=0):
         qos_check(qos)
         if not topic:
             raise ValueError("Empty topic.")
-        self._lw_topic = topic
-        self._lw_msg = msg
+        self._lw_topic = _as_bytes(topic)
+        self._lw_msg = _as_bytes(msg)
         self._lw_qos = qos
         self._lw_retain = retain
 
@@ -189,9 +379,14 @@ class MQTT_base:
     def _timeout(self, t):
         return ticks_diff(ticks_ms(), t) > self._response_time
 
+    # With stream I/O the socket is waited on through the uasyncio I/O queue
+    # and the task only wakes when it is ready. Otherwise it is polled every
+    # _SOCKET_POLL_DELAY ms. Sockets other than ._sock are always polled.
     async def _as_read(self, n, sock=None):  # OSError caught by superclass
+        stream = None
         if sock is None:
             sock = self._sock
+            stream = self._stream
         # Declare a byte array of size n. That space is needed anyway, better
         # to just 'allocate' it in one go instead of appending to an
         # existing object, this prevents reallocation and fragmentation.
@@ -203,7 +398,12 @@ class MQTT_base:
             if self._timeout(t) or not self.isconnected():
                 raise OSError(-1, "Timeout on socket read")
             try:
-                msg_size = sock.readinto(buffer[size:], n - size)
+                if stream is None:
+                    msg_size = sock.readinto(buffer[size:], n - size)
+                else:  # Returns when data is available
+                    msg_size = await asyncio.wait_for_ms(stream.readinto(buffer[size:]), self._response_time)
+            except asyncio.TimeoutError:
+                raise OSError(-1, "Timeout on socket read")
             except OSError as e:  # ESP32 issues weird 119 errors here
                 msg_size = None
                 if e.args[0] not in BUSY_ERRORS:
@@ -214,17 +414,37 @@ class MQTT_base:
                 size += msg_size
                 t = ticks_ms()
                 self.last_rx = ticks_ms()
-            await asyncio.sleep_ms(_SOCKET_POLL_DELAY)
+            if stream is None and size < n:
+                await asyncio.sleep_ms(_SOCKET_POLL_DELAY)
         return data
 
     async def _as_write(self, bytes_wr, length=0, sock=None):
+        stream = None
         if sock is None:
             sock = self._sock
+            stream = self._stream
 
         # Wrap bytes in memoryview to avoid copying during slicing
         bytes_wr = memoryview(bytes_wr)
         if length:
             bytes_wr = bytes_wr[:length]
+        if stream is not None:
+            if not self.isconnected():
+                raise OSError(-1, "Timeout on socket write")
+            try:
+                stream.write(bytes_wr)  # Buffers whatever the socket can't take
+            except OSError as e:
+                # Nothing was sent or buffered: .out_buf is always drained
+                # here. Carry on polling, as without stream_io.
+                if e.args[0] not in BUSY_ERRORS:
+                    raise
+            else:
+                if stream.out_buf:  # Wait until it is written
+                    try:
+                        await asyncio.wait_for_ms(stream.drain(), self._response_time)
+                    except asyncio.TimeoutError:
+                        raise OSError(-1, "Timeout on socket write")
+                return
         t = ticks_ms()
         while bytes_wr:
             if self._timeout(t) or not self.isconnected():
@@ -238,26 +458,18 @@ class MQTT_base:
             if n:
                 t = ticks_ms()
                 bytes_wr = bytes_wr[n:]
-            await asyncio.sleep_ms(_SOCKET_POLL_DELAY)
+            if bytes_wr:  # Only wait if the socket could not take it all
+                await asyncio.sleep_ms(_SOCKET_POLL_DELAY)
 
-    async def _send_str(self, s):
-        await self._as_write(struct.pack("!H", len(s)))
-        await self._as_write(s)
-
-    async def _recv_len(self):
-        n = 0
-        sh = 0
-        while 1:
-            res = await self._as_read(1)
-            b = res[0]
-            n |= (b & 0x7F) << sh
-            if not b & 0x80:
-                return n
-            sh += 7
+    # Return a buffer able to hold a packet of n bytes: the shared ._obuf
+    # if it fits, else a one-off allocation. Caller must hold .lock.
+    def _pkt_buf(self, n):
+        return self._obuf if n <= len(self._obuf) else bytearray(n)
 
     async def _connect(self, clean):
         self._sock = socket.socket()
         self._sock.setblocking(False)
+        self._ilen = 0  # Discard anything left over from previous connection
         try:
             self._sock.connect(self._addr)
         except OSError as e:
@@ -269,37 +481,36 @@ class MQTT_base:
             import ussl
 
             self._sock = ussl.wrap_socket(self._sock, **self._ssl_params)
-        premsg = bytearray(b"\x10\0\0\0\0\0")
-        msg = bytearray(b"\x04MQTT\x04\0\0\0")  # Protocol 3.1.1
-
-        sz = 10 + 2 + len(self._client_id)
-        msg[6] = clean << 1
-        if self._user:
-            sz += 2 + len(self._user) + 2 + len(self._pswd)
-            msg[6] |= 0xC0
-        if self._keepalive:
-            msg[7] |= self._keepalive >> 8
-            msg[8] |= self._keepalive & 0x00FF
+        self._stream = asyncio.StreamReader(self._sock) if self._stream_io else None
+        client_id = _as_bytes(self._client_id)
+        user = _as_bytes(self._user)
+        pswd = _as_bytes(self._pswd)
+        sz = 10 + 2 + len(client_id)
+        flags = clean << 1
+        if user:
+            sz += 2 + len(user) + 2 + len(pswd)
+            flags |= 0xC0
         if self._lw_topic:
             sz += 2 + len(self._lw_topic) + 2 + len(self._lw_msg)
-            msg[6] |= 0x4 | (self._lw_qos & 0x1) << 3 | (self._lw_qos & 0x2) << 3
-            msg[6] |= self._lw_retain << 5
-
-        i = 1
-        while sz > 0x7F:
-            premsg[i] = (sz & 0x7F) | 0x80
-            sz >>= 7
-            i += 1
-        premsg[i] = sz
-        await self._as_write(premsg, i + 2)
-        await self._as_write(msg)
-        await self._send_str(self._client_id)
-        if self._lw_topic:
-            await self._send_str(self._lw_topic)
-            await self._send_str(self._lw_msg)
-        if self._user:
-            await self._send_str(self._user)
-            await self._send_str(self._pswd)
+            flags |= 0x4 | (self._lw_qos & 0x1) << 3 | (self._lw_qos & 0x2) << 3
+            flags |= self._lw_retain << 5
+
+        async with self.lock:
+            pkt = self._pkt_buf(1 + _len_len(sz) + sz)
+            pkt[0] = 0x10
+            i = _put_len(pkt, 1, sz)
+            pkt[i : i + 7] = b"\x00\x04MQTT\x04"  # Protocol 3.1.1
+            pkt[i + 7] = flags
+            pkt[i + 8] = self._keepalive >> 8
+            pkt[i + 9] = self._keepalive & 0x00FF
+            i = _put_str(pkt, i + 10, client_id)
+            if self._lw_topic:
+                i = _put_str(pkt, i, self._lw_topic)
+                i = _put_str(pkt, i, self._lw_msg)
+            if user:
+                i = _put_str(pkt, i, user)
+                i = _put_str(pkt, i, pswd)
+            await self._as_write(pkt, i)
         # Await CONNACK
         # read causes ECONNABORTED if broker is out; triggers a reconnect.
         resp = await self._as_read(4)
@@ -386,152 +597,246 @@ class MQTT_base:
             return True  # PID received. All done.
         return False
 
-    # qos == 1: coro blocks until wait_msg gets correct PID.
+    # qos == 1: coro blocks until wait_msg gets correct PID. Up to
+    # max_inflight publications may await their PUBACK at the same time.
     # If WiFi fails completely subclass re-publishes with new PID.
     async def publish(self, topic, msg, retain, qos):
         pid = next(self.newpid)
-        if qos:
-            self.rcv_pids.add(pid)
-        async with self.lock:
-            await self._publish(topic, msg, retain, qos, 0, pid)
         if qos == 0:
+            async with self.lock:
+                await self._publish(topic, msg, retain, qos, 0, pid)
             return
 
-        count = 0
-        while 1:  # Await PUBACK, republish on timeout
-            if await self._await_pid(pid):
-                return
-            # No match
-            if count >= self._max_repubs or not self.isconnected():
-                raise OSError(-1)  # Subclass to re-publish with new PID
+        while len(self._inflight) + self._sending >= self._max_inflight:  # Window full
+            self._acked.clear()
+            await self._acked.wait()
+        p = InFlight(topic, msg, retain)
+        self._sending += 1
+        try:
             async with self.lock:
-                await self._publish(topic, msg, retain, qos, dup=1, pid=pid)  # Add pid
-            count += 1
+                await self._publish(topic, msg, retain, qos, 0, pid)
+                # Only now may ._republish() see it: waiting for the lock can
+                # take longer than response_time, a DUP must not go out first.
+                p.t = ticks_ms()
+                self._inflight[pid] = p
+        except OSError:
+            self._acked.set()  # Its slot in the window is free again
+            raise
+        finally:
+            self._sending -= 1
+        self._timer.set()  # Wake ._republish()
+        await p.done.wait()  # Set by ._dispatch() or ._fail()
+        if p.count < 0:
+            raise OSError(-1)  # Subclass to re-publish with new PID
+
+    # Mark a qos 1 publication as failed and wake its publisher.
+    def _fail(self, pid):
+        p = self._inflight.pop(pid, None)
+        if p is not None:
+            p.count = -1
+            p.done.set()
+            self._acked.set()
+
+    def _fail_inflight(self):
+        for pid in list(self._inflight):
+            self._fail(pid)
+
+    # Single timer for all qos 1 publications awaiting PUBACK: sleeps until
+    # the oldest one is due and republishes it, or fails it once
+    # max_repubs republications went unanswered.
+    async def _republish(self):
+        while True:
+            if not self._inflight:
+                self._timer.clear()
+                await self._timer.wait()
+                continue
+            now = ticks_ms()
+            due = None
+            wait = self._response_time
+            for pid, p in self._inflight.items():
+                dt = self._response_time - ticks_diff(now, p.t)
+                if dt <= wait:
+                    due, wait = pid, dt
+            if wait > 0:
+                await asyncio.sleep_ms(wait)
+                continue
+            p = self._inflight[due]
+            if p.count >= self._max_repubs or not self.isconnected():
+                self._fail(due)
+                continue
+            p.count += 1
+            p.t = ticks_ms()
             self.REPUB_COUNT += 1
+            try:
+                async with self.lock:
+                    await self._publish(p.topic, p.msg, p.retain, 1, dup=1, pid=due)  # Add pid
+            except OSError:
+                self._fail(due)
 
     async def _publish(self, topic, msg, retain, qos, dup, pid):
-        pkt = bytearray(b"\x30\0\0\0")
-        pkt[0] |= qos << 1 | retain | dup << 3
+        topic = _as_bytes(topic)
+        msg = _as_bytes(msg)
         sz = 2 + len(topic) + len(msg)
         if qos > 0:
             sz += 2
         if sz >= 2097152:
             raise MQTTException("Strings too long.")
-        i = 1
-        while sz > 0x7F:
-            pkt[i] = (sz & 0x7F) | 0x80
-            sz >>= 7
-            i += 1
-        pkt[i] = sz
-        await self._as_write(pkt, i + 1)
-        await self._send_str(topic)
+        pkt = self._pkt_buf(1 + _len_len(sz) + sz)
+        pkt[0] = 0x30 | qos << 1 | retain | dup << 3
+        i = _put_len(pkt, 1, sz)
+        i = _put_str(pkt, i, topic)
         if qos > 0:
-            struct.pack_into("!H", pkt, 0, pid)
-            await self._as_write(pkt, 2)
-        await self._as_write(msg)
+            struct.pack_into("!H", pkt, i, pid)
+            i += 2
+        n = len(msg)
+        pkt[i : i + n] = msg
+        await self._as_write(pkt, i + n)
 
     # Can raise OSError if WiFi fails. Subclass traps.
     async def subscribe(self, topic, qos):
-        pkt = bytearray(b"\x82\0\0\0")
+        topic = _as_bytes(topic)
         pid = next(self.newpid)
         self.rcv_pids.add(pid)
-        struct.pack_into("!BH", pkt, 1, 2 + 2 + len(topic) + 1, pid)
+        sz = 2 + 2 + len(topic) + 1
         async with self.lock:
-            await self._as_write(pkt)
-            await self._send_str(topic)
-            await self._as_write(qos.to_bytes(1, "little"))
+            pkt = self._pkt_buf(1 + _len_len(sz) + sz)
+            pkt[0] = 0x82
+            i = _put_len(pkt, 1, sz)
+            struct.pack_into("!H", pkt, i, pid)
+            i = _put_str(pkt, i + 2, topic)
+            pkt[i] = qos
+            await self._as_write(pkt, i + 1)
 
         if not await self._await_pid(pid):
             raise OSError(-1)
 
     # Can raise OSError if WiFi fails. Subclass traps.
     async def unsubscribe(self, topic):
-        pkt = bytearray(b"\xa2\0\0\0")
+        topic = _as_bytes(topic)
         pid = next(self.newpid)
         self.rcv_pids.add(pid)
-        struct.pack_into("!BH", pkt, 1, 2 + 2 + len(topic), pid)
+        sz = 2 + 2 + len(topic)
         async with self.lock:
-            await self._as_write(pkt)
-            await self._send_str(topic)
+            pkt = self._pkt_buf(1 + _len_len(sz) + sz)
+            pkt[0] = 0xA2
+            i = _put_len(pkt, 1, sz)
+            struct.pack_into("!H", pkt, i, pid)
+            i = _put_str(pkt, i + 2, topic)
+            await self._as_write(pkt, i)
 
         if not await self._await_pid(pid):
             raise OSError(-1)
 
-    # Wait for a single incoming MQTT message and process it.
-    # Subscribed messages are delivered to a callback previously
-    # set by .setup() method. Other (internal) MQTT
-    # messages processed internally.
-    # Immediate return if no data available. Called from ._handle_msg().
+    # Read whatever the socket has into the receive buffer and process every
+    # complete packet in it. Subscribed messages are delivered to the callback
+    # set in config["subs_cb"] as memoryviews into the receive buffer: they
+    # are only valid for the duration of the callback. With the event
+    # interface copies are put on the queue. Other (internal) MQTT messages
+    # are processed internally. Immediate return if no data available.
+    # Called from ._handle_msg().
     async def wait_msg(self):
         try:
-            res = self._sock.read(1)  # Throws OSError on WiFi fail
+            n = self._sock.readinto(self._ibv[self._ilen :])  # Throws OSError on WiFi fail
         except OSError as e:
             if e.args[0] in BUSY_ERRORS:  # Needed by RP2
                 await asyncio.sleep_ms(0)
                 return
             raise
-        if res is None:
+        await self._process(n)
+
+    # Process n bytes newly read into the receive buffer.
+    async def _process(self, n):
+        ibv = self._ibv
+        if n is None:
             return
-        if res == b"":
+        if n == 0:
             raise OSError(-1, "Empty response")
-
-        if res == b"\xd0":  # PINGRESP
-            await self._as_read(1)  # Update .last_rx time
+        self.last_rx = ticks_ms()
+        n += self._ilen
+        i = 0
+        size = 0  # Total size of a partial packet left in the buffer
+        while i < n:  # Frame as many complete packets as are buffered
+            hdr = _get_len(ibv, i + 1, n)
+            if hdr is None:
+                break  # Remaining length incomplete
+            sz, j = hdr
+            if j + sz > n:
+                size = j + sz - i
+                break  # Packet incomplete
+            await self._dispatch(ibv, ibv[i], j, j + sz)
+            i = j + sz
+        n -= i
+        if i and n:  # Move partial packet to start of buffer
+            ibv[:n] = ibv[i : i + n]
+        self._ilen = n
+        if size > len(ibv):
+            # Packet too big for the receive buffer: read the rest of it
+            # into a one-off buffer.
+            pkt = bytearray(size)
+            pkt[:n] = ibv[:n]
+            pkt[n:] = await self._as_read(size - n)
+            self._ilen = 0
+            await self._dispatch(memoryview(pkt), pkt[0], size - sz, size)
+
+    # Process a single packet. buf[i:end] is the packet body following the
+    # fixed header.
+    async def _dispatch(self, buf, op, i, end):
+        if op == 0xD0:  # PINGRESP: .last_rx already updated
             return
-        op = res[0]
 
         if op == 0x40:  # PUBACK: save pid
-            sz = await self._as_read(1)
-            if sz != b"\x02":
+            if end - i != 2:
                 raise OSError(-1, "Invalid PUBACK packet")
-            rcv_pid = await self._as_read(2)
-            pid = rcv_pid[0] << 8 | rcv_pid[1]
-            if pid in self.rcv_pids:
-                self.rcv_pids.discard(pid)
-            else:
+            pid = buf[i] << 8 | buf[i + 1]
+            p = self._inflight.pop(pid, None)
+            if p is None:
                 raise OSError(-1, "Invalid pid in PUBACK packet")
+            p.done.set()
+            self._acked.set()
+            return
 
         if op == 0x90:  # SUBACK
-            resp = await self._as_read(4)
-            if resp[3] == 0x80:
+            if buf[end - 1] == 0x80:
                 raise OSError(-1, "Invalid SUBACK packet")
-            pid = resp[2] | (resp[1] << 8)
+            pid = buf[i] << 8 | buf[i + 1]
             if pid in self.rcv_pids:
                 self.rcv_pids.discard(pid)
             else:
                 raise OSError(-1, "Invalid pid in SUBACK packet")
+            return
 
         if op == 0xB0:  # UNSUBACK
-            resp = await self._as_read(3)
-            pid = resp[2] | (resp[1] << 8)
+            pid = buf[i] << 8 | buf[i + 1]
             if pid in self.rcv_pids:
                 self.rcv_pids.discard(pid)
             else:
                 raise OSError(-1)
+            return
 
         if op & 0xF0 != 0x30:
             return
-        sz = await self._recv_len()
-        topic_len = await self._as_read(2)
-        topic_len = (topic_len[0] << 8) | topic_len[1]
-        topic = await self._as_read(topic_len)
-        sz -= topic_len + 2
+        if op & 6 == 4:  # qos 2 not supported
+            raise OSError(-1, "QoS 2 not supported")
+        topic_len = buf[i] << 8 | buf[i + 1]
+        i += 2
+        topic = buf[i : i + topic_len]
+        i += topic_len
         if op & 6:
-            pid = await self._as_read(2)
-            pid = pid[0] << 8 | pid[1]
-            sz -= 2
-        msg = await self._as_read(sz)
+            pid = buf[i] << 8 | buf[i + 1]
+            i += 2
+        msg = buf[i:end]
         retained = op & 0x01
         if self._events:
-            self.queue.put(topic, msg, bool(retained))
+            self.queue.put(bytes(topic), bytes(msg), bool(retained))
         else:
             self._cb(topic, msg, bool(retained))
         if op & 6 == 2:  # qos 1
-            pkt = bytearray(b"\x40\x02\0\0")  # Send PUBACK
-            struct.pack_into("!H", pkt, 2, pid)
-            await self._as_write(pkt)
-        elif op & 6 == 4:  # qos 2 not supported
-            raise OSError(-1, "QoS 2 not supported")
+            async with self.lock:  # Send PUBACK
+                pkt = self._obuf
+                pkt[0] = 0x40
+                pkt[1] = 0x02
+                struct.pack_into("!H", pkt, 2, pid)
+                await self._as_write(pkt, 4)
 
 
 # MQTTClient class. Handles issues relating to connectivity.
@@ -650,8 +955,11 @@ class MQTTClient(MQTT_base):
             asyncio.create_task(self._keep_connected())
             # Runs forever unless user issues .disconnect()
 
-        asyncio.create_task(self._handle_msg())  # Task quits on connection fail.
+        # Task quits on connection fail. With stream I/O it may be waiting for
+        # data when the link goes down, so it is cancelled with the others.
+        self._tasks.append(asyncio.create_task(self._handle_msg()))
         self._tasks.append(asyncio.create_task(self._keep_alive()))
+        self._tasks.append(asyncio.create_task(self._republish()))
         if self.DEBUG:
             self._tasks.append(asyncio.create_task(self._memory()))
         if self._events:
@@ -664,9 +972,19 @@ class MQTTClient(MQTT_base):
     async def _handle_msg(self):
         try:
             while self.isconnected():
-                async with self.lock:
-                    await self.wait_msg()  # Immediate return if no message
-                await asyncio.sleep_ms(_DEFAULT_MS)  # Let other tasks get lock
+                if self._stream is None:
+                    async with self.rlock:
+                        await self.wait_msg()  # Immediate return if no message
+                    await asyncio.sleep_ms(_DEFAULT_MS)  # Poll interval
+                else:  # Sleep until the socket is readable
+                    try:
+                        n = await self._stream.readinto(self._ibv[self._ilen :])
+                    except OSError as e:
+                        if e.args[0] not in BUSY_ERRORS:
+                            raise
+                        n = None
+                    async with self.rlock:
+                        await self._process(n)
 
         except OSError:
             pass
@@ -712,6 +1030,7 @@ class MQTTClient(MQTT_base):
     def _reconnect(self):  # Schedule a reconnection if not underway.
         if self._isconnected:
             self._isconnected = False
+            self._fail_inflight()  # Publishers re-publish with new PID on reconnect
             asyncio.create_task(self._kill_tasks(True))  # Shut down tasks and socket
             if self._events:  # Signal an outage
                 self.down.set()
@@ -729,7 +1048,8 @@ class MQTTClient(MQTT_base):
         while self._has_connected:
             if self.isconnected():  # Pause for 1 second
                 await asyncio.sleep(1)
-                gc.collect()
+                if self._gc_collect:
+                    gc.collect()
             else:  # Link is down, socket is closed, tasks are killed
                 try:
                     self._sta_if.disconnect()
@@ -0,0 +1,108 @@
+# Where the time of a game tick goes.
+#
+# Game.tick calls begin() when a tick starts and mark(phase) whenever a phase
+# ends, so each phase is charged the time since the previous mark. A phase
+# can be marked several times per tick, e.g. drawing before and after the
+# stats bar, its times add up. end() closes the tick.
+#
+# Two preallocated rings keep the data: the time of every begin() and mark()
+# for dump(), and the time per phase of the most recent ticks for rolling
+# percentiles. Every report_ms the p50 and p99 of each phase are passed to
+# report as text like "input=3/9 logic=210/380 draw=1500/2900 ...", in
+# microseconds.
+#
+# dump() writes the event ring as text, one "phase ticks_us" line per event
+# with phase -1 starting a tick. host/chrome_trace.py turns that into Chrome
+# trace events. main.py writes it to PROFILE_FILE whenever a game ends.
+from array import array
+from micropython import const
+from utime import ticks_ms, ticks_us, ticks_diff
+
+PHASE_INPUT = const(0)
+PHASE_LOGIC = const(1)
+PHASE_DRAW = const(2)
+PHASE_STATS = const(3)
+PHASE_FLUSH = const(4)
+PHASE_GC = const(5)
+PHASES = const(6)
+PHASE_NAMES = ("input", "logic", "draw", "stats", "flush", "gc")
+TICK = const(255)  # begin() in the event ring
+
+
+class TickProfiler:
+    def __init__(self, ticks=128, events=512, report=None, report_ms=10000):
+        """
+        :param ticks: Number of most recent ticks the percentiles are over.
+
+        :param events: Number of begin() and mark() calls kept for dump().
+
+        :param report: Called every report_ms with the summary().
+        """
+        self.durations = [array("L", (0 for _ in range(ticks))) for _ in range(PHASES)]
+        self.ticks = ticks
+        self.tick_index = 0
+        self.tick_count = 0
+
+        self.event_times = array("L", (0 for _ in range(events)))
+        self.event_phases = bytearray(events)
+        self.events = events
+        self.event_index = 0
+        self.event_count = 0
+
+        self.report = report
+        self.report_ms = report_ms
+        self.reported = ticks_ms()
+        self.last = ticks_us()
+
+    def event(self, phase, now):
+        i = self.event_index
+        self.event_times[i] = now
+        self.event_phases[i] = phase
+        self.event_index = (i + 1) % self.events
+        if self.event_count < self.events:
+            self.event_count += 1
+
+    def begin(self):
+        now = ticks_us()
+        i = self.tick_index
+        for durations in self.durations:
+            durations[i] = 0
+        self.last = now
+        self.event(TICK, now)
+
+    def mark(self, phase):
+        """charge the time since the previous mark, or begin(), to phase"""
+        now = ticks_us()
+        self.durations[phase][self.tick_index] += ticks_diff(now, self.last)
+        self.last = now
+        self.event(phase, now)
+
+    def end(self):
+        self.tick_index = (self.tick_index + 1) % self.ticks
+        if self.tick_count < self.ticks:
+            self.tick_count += 1
+        if self.report is not None and ticks_diff(ticks_ms(), self.reported) >= self.report_ms:
+            self.reported = ticks_ms()
+            self.report(self.summary())
+
+    def percentile(self, phase, p):
+        """p-th percentile of the time spent in phase over the recent ticks"""
+        if not self.tick_count:
+            return 0
+        values = sorted(self.durations[phase][:self.tick_count])
+        return values[(len(values) - 1) * p // 100]
+
+    def summary(self):
+        return " ".join(
+            "%s=%d/%d" % (PHASE_NAMES[phase], self.percentile(phase, 50), self.percentile(phase, 99))
+            for phase in range(PHASES)
+        )
+
+    def dump(self, stream):
+        """write the event ring, oldest first, to stream"""
+        stream.write("# tickprof %s\n" % " ".join(PHASE_NAMES))
+        i = (self.event_index - self.event_count) % self.events
+        for _ in range(self.event_count):
+            phase = self.event_phases[i]
+            stream.write("%d %d\n" % (-1 if phase == TICK else phase, self.event_times[i]))
+            i = (i + 1) % self.events
@@ -0,0 +1,182 @@
+import uasyncio as asyncio
+
+from mqtt_as import TopicRouter
+
+
+class Mailbox:
+    """Holds only the newest value put into it."""
+    def __init__(self):
+        self.value = None
+        self.pending = False
+        self.coalesced = 0  # values replaced before they were taken
+        self.appended = 0  # values added to the pending one
+        self.event = asyncio.Event()
+        self.drained = asyncio.Event()  # set whenever the value is taken
+
+    def put(self, value):
+        if self.pending:
+            self.coalesced += 1
+        self.value = value
+        self.appended = 0
+        self.pending = True
+        self.event.set()
+
+    def append(self, value):
+        """
+        Add value to the end of the pending one instead of replacing it, or
+        put it if there is none. Values are bytes-like.
+        """
+        if self.pending:
+            self.value += value
+            self.appended += 1
+        else:
+            self.put(bytearray(value))
+
+    async def take(self):
+        while not self.pending:
+            self.event.clear()
+            await self.event.wait()
+        self.pending = False
+        self.drained.set()
+        value, self.value = self.value, None
+        return value
+
+    async def drain(self):
+        """wait until no value is pending"""
+        while self.pending:
+            self.drained.clear()
+            await self.drained.wait()
+
+
+# minimum time between two publications per topic, 0 for no limit
+SCORE_MIN_INTERVAL_MS = 0
+GAMESTATE_MIN_INTERVAL_MS = 200
+# game state frames waiting to be published together, at most this many
+GAMESTATE_BATCH_FRAMES = 32
+
+
+class SnakePubsubber:
+    def __init__(self, mqtt_client, topic_prefix, player_name_self):
+        self.mqtt_client = mqtt_client
+        self.topic_prefix = topic_prefix
+        # a str, as the names of the other players in scores
+        if isinstance(player_name_self, bytes):
+            player_name_self = player_name_self.decode()
+        self.player_name_self = player_name_self
+
+        self.scores = {
+            "A": 0,
+            "B": 0,
+            "C": 0,
+            "D": 0,
+            "E": 0,
+            "F": 0,
+        }
+        # incremented with every change to scores, so that the stats bar is
+        # only rendered again when needed
+        self.scores_version = 0
+
+        self.player_name_self_bytes = player_name_self.encode()
+        self.router = TopicRouter()
+        self.router.add(f"{self.topic_prefix}/+/score", self.on_score)
+
+        # Outgoing messages wait in a mailbox each, so that no matter how fast
+        # the game runs only the newest score is kept. Game state deltas are
+        # collected until they are published, see report_gamestate().
+        self.score_box = Mailbox()
+        self.gamestate_box = Mailbox()
+        self.gc_box = Mailbox()
+        self.perf_box = Mailbox()
+
+    def on_score(self, topic, msg, retained, player):
+        if player == self.player_name_self_bytes:
+            return
+        try:
+            # msg_parsed = json.loads(msg.decode())
+            score = int(msg)
+        except Exception as ex:
+            print(f"Failed to decode arriving message: {msg}")
+            return
+        player = player.decode()
+        if self.scores.get(player) != score:
+            self.scores[player] = score
+            self.scores_version += 1
+
+    async def subber(self):
+        if not self.mqtt_client.isconnected():
+            return
+        
+        await self.mqtt_client.subscribe(topic=f"{self.topic_prefix}/+/score")
+
+        async for topic, msg, retained in self.mqtt_client.queue:
+            self.router.route(topic, msg, retained)
+
+    async def publisher(self, box, topic, min_interval_ms, yield_to=None):
+        """
+        Long-lived task publishing the newest value from box at most once per
+        min_interval_ms. Values arriving in between replace the pending one.
+        While offline, mqtt_client.publish() waits for the connection and
+        only the newest value is kept in the meantime.
+
+        :param yield_to: Mailbox with higher priority: while it holds a
+            value, publication from box waits.
+        """
+        while True:
+            value = await box.take()
+            if yield_to is not None:
+                await yield_to.drain()
+            await self.mqtt_client.publish(topic=topic, msg=value, retain=True, qos=0)
+            if min_interval_ms:
+                await asyncio.sleep_ms(min_interval_ms)
+
+    def publisher_tasks(self):
+        prefix = f"{self.topic_prefix}/{self.player_name_self}"
+        return [
+            asyncio.create_task(self.publisher(
+                self.score_box, f"{prefix}/score", SCORE_MIN_INTERVAL_MS
+            )),
+            asyncio.create_task(self.publisher(
+                self.gamestate_box, f"{prefix}/game", GAMESTATE_MIN_INTERVAL_MS,
+                yield_to=self.score_box,
+            )),
+            asyncio.create_task(self.publisher(
+                self.gc_box, f"{prefix}/gc", 0, yield_to=self.score_box,
+            )),
+            asyncio.create_task(self.publisher(
+                self.perf_box, f"{prefix}/perf", 0, yield_to=self.score_box,
+            )),
+        ]
+
+    def report_score(self, score):
+        if self.scores.get(self.player_name_self) != score:
+            self.scores[self.player_name_self] = score
+            self.scores_version += 1
+        self.score_box.put(f"{score}")
+
+    def gamestate_needs_keyframe(self):
+        """
+        True if the next game state can't be a delta: the message waiting to
+        be published has no room for another frame. The next keyframe
+        replaces it.
+        """
+        box = self.gamestate_box
+        return box.pending and box.appended + 1 >= GAMESTATE_BATCH_FRAMES
+
+    def report_gamestate(self, payload):
+        """
+        Publish a frame from gamestate.GamestateEncoder. A keyframe replaces
+        the message waiting to be published, a delta is added to it, so that
+        no delta is lost as long as gamestate_needs_keyframe() is respected.
+        """
+        if payload[0] == 0x4B:  # "K"
+            self.gamestate_box.put(bytearray(payload))
+        else:
+            self.gamestate_box.append(payload)
+
+    def report_gc(self, gc_us_per_s):
+        """publish the microseconds per second spent collecting garbage"""
+        self.gc_box.put(f"{gc_us_per_s}")
+
+    def report_perf(self, summary):
+        """publish the TickProfiler summary of where the tick time goes"""
+        self.perf_box.put(summary)
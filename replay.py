@@ -0,0 +1,181 @@
+# Recording and replaying games.
+#
+# A game is fully determined by where the food lands and by the turns the
+# player makes. Food placement comes from an Xorshift32 with a recorded seed,
+# which gives the same numbers on every port, unlike the random module. The
+# turns are recorded as the direction the snake heads in after each step it
+# plays, 2 bits per step, run-length encoded.
+#
+# Header:    b"SNKR" version seed grid_width grid_height
+#            version as one byte, seed as four bytes and grid dimensions
+#            as two bytes each (big endian)
+# Runs:      heading << 6 | count   count (1..63) steps heading UP, DOWN,
+#                                   LEFT or RIGHT (0..3)
+#            0x00 count             count (1..255) steps waiting on the start
+#                                   screen without a key press
+#
+# The step on the start screen that starts the game is implied by the run
+# that follows it. Steps showing the score need no input and aren't
+# recorded.
+from micropython import const
+
+from snake import (
+    Direction, GAMESTATE_READY_TO_START, GAMESTATE_PLAYING, KEY_UP, KEY_DOWN, KEY_LEFT, KEY_RIGHT
+)
+
+MAGIC = b"SNKR"
+VERSION = const(2)
+HEADER_SIZE = const(13)
+WAIT = const(0x00)
+MAX_RUN = const(63)
+MAX_WAIT = const(255)
+
+# heading to key and direction, in the order of their 2 bit codes
+HEADING_KEYS = (KEY_UP, KEY_DOWN, KEY_LEFT, KEY_RIGHT)
+HEADING_DIRECTIONS = (
+    Direction(xdir=0, ydir=-1),
+    Direction(xdir=0, ydir=1),
+    Direction(xdir=-1, ydir=0),
+    Direction(xdir=1, ydir=0),
+)
+
+
+class Xorshift32:
+    """Random numbers for Food that are the same on every port and build."""
+
+    def __init__(self, seed):
+        self.state = (seed & 0xFFFFFFFF) or 1  # 0 would stay 0 forever
+
+    def randint(self, a, b):
+        x = self.state
+        x ^= (x << 13) & 0xFFFFFFFF
+        x ^= x >> 17
+        x ^= (x << 5) & 0xFFFFFFFF
+        self.state = x
+        return a + x % (b - a + 1)
+
+
+class Recorder:
+    def __init__(self, stream, seed, grid_width, grid_height):
+        """
+        Records a game to stream, a file or anything else with write() and
+        flush().
+        The game must place food with Xorshift32(seed) and call record()
+        after every step.
+        """
+        self.stream = stream
+        self.byte = bytearray(1)
+        self.heading = 0
+        self.run = 0  # steps heading in self.heading not written yet
+        self.wait = 0  # steps waiting on the start screen not written yet
+        stream.write(MAGIC + bytes((
+            VERSION, seed >> 24 & 0xFF, seed >> 16 & 0xFF, seed >> 8 & 0xFF, seed & 0xFF,
+            grid_width >> 8, grid_width & 0xFF, grid_height >> 8, grid_height & 0xFF,
+        )))
+
+    def record(self, game, state):
+        """note the step game just took, which started in state"""
+        if state == GAMESTATE_READY_TO_START:
+            self.write_run()
+            if game.state == GAMESTATE_READY_TO_START:
+                self.wait += 1
+                if self.wait == MAX_WAIT:
+                    self.write_wait()
+            else:
+                self.write_wait()
+        elif state == GAMESTATE_PLAYING:
+            heading = HEADING_DIRECTIONS.index(game.snake.direction)
+            if heading != self.heading:
+                self.write_run()
+                self.heading = heading
+            self.run += 1
+            if self.run == MAX_RUN:
+                self.write_run()
+
+    def write_run(self):
+        if self.run:
+            self.byte[0] = self.heading << 6 | self.run
+            self.stream.write(self.byte)
+            self.run = 0
+
+    def write_wait(self):
+        if self.wait:
+            self.stream.write(bytes((WAIT, self.wait)))
+            self.wait = 0
+        # when a game starts, and every MAX_WAIT steps on the start screen, to
+        # keep the recording on flash up to date
+        self.stream.flush()
+
+    def close(self):
+        """write what is still pending, the stream stays open"""
+        self.write_run()
+        self.write_wait()
+
+
+class Replayer:
+    def __init__(self, data):
+        """
+        :param data: A recording as written by Recorder.
+
+        Raises ValueError if data is not a recording of this version.
+        """
+        if len(data) < HEADER_SIZE or data[:4] != MAGIC or data[4] != VERSION:
+            raise ValueError("not a game recording")
+        self.data = data
+        self.seed = data[5] << 24 | data[6] << 16 | data[7] << 8 | data[8]
+        self.grid_width = data[9] << 8 | data[10]
+        self.grid_height = data[11] << 8 | data[12]
+
+    def rng(self):
+        """a new random number generator placing food like in the recording"""
+        return Xorshift32(self.seed)
+
+    async def run(self, game):
+        """
+        Play the recording on game, which has to be fresh and use rng(). The
+        steps run back to back, like Game.tick does them but without waiting
+        for their deadlines. Returns the number of steps taken.
+
+        Raises ValueError if game is played on a grid of another size than
+        the recording.
+        """
+        if (game.grid_width, game.grid_height) != (self.grid_width, self.grid_height):
+            raise ValueError("recording is of a %dx%d grid, not %dx%d" % (
+                self.grid_width, self.grid_height, game.grid_width, game.grid_height
+            ))
+        data = self.data
+        i = HEADER_SIZE
+        heading = 0
+        run = 0
+        wait = 0
+        steps = 0
+        while True:
+            if game.state == GAMESTATE_READY_TO_START or (game.state == GAMESTATE_PLAYING and not run):
+                if not (run or wait):
+                    if i >= len(data):
+                        return steps
+                    if data[i] == WAIT:
+                        wait = data[i + 1]
+                        i += 2
+                    else:
+                        heading = data[i] >> 6
+                        run = data[i] & MAX_RUN
+                        i += 1
+                    continue
+
+            if game.state == GAMESTATE_READY_TO_START:
+                if wait:
+                    wait -= 1
+                else:
+                    # the key stays queued and becomes the first heading
+                    game.inputs.put(HEADING_KEYS[heading])
+            elif game.state == GAMESTATE_PLAYING:
+                if wait:
+                    raise ValueError("recording does not match the game")
+                run -= 1
+                if game.snake.direction != HEADING_DIRECTIONS[heading] and not game.inputs.pending():
+                    game.inputs.put(HEADING_KEYS[heading])
+
+            await game.step()
+            game.gc_budget.idle()
+            steps += 1
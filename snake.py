@@ -1,8 +1,16 @@
+from array import array
 from collections import namedtuple
 from micropython import const
-from random import randint
+import random
 import uasyncio as asyncio
-import gc
+import framebuf
+from utime import ticks_us, ticks_diff, ticks_add
+
+from gamestate import GamestateEncoder
+from gcbudget import GcBudget
+from inputring import InputRing
+from profiler import PHASE_INPUT, PHASE_LOGIC, PHASE_DRAW, PHASE_STATS, PHASE_FLUSH, PHASE_GC
+from sprites import Sprites, LINK_UP, LINK_DOWN, LINK_LEFT, LINK_RIGHT
 
 # RGB565 breaks my brain.
 # https://embeddednotepad.com/page/rgb565-color-picker
@@ -17,6 +25,17 @@ background_color = const(0x0000)
 # 
 game_stats_bg_color = const(0xffff) # const(0xf81f) <-- this looks lime green, why!?
 game_stats_text_color = const(0x1111)
+game_stats_y = const(123)  # top of the stats bar
+
+# score colors in the stats bar by player, others get game_stats_text_color
+player_colors = {
+    "A": 0xf800,
+    "B": 0xf800,
+    "C": 0xf800,
+    "D": 0x07E0,
+    "E": 0x07E0,
+    "F": 0x07E0,
+}
 
 
 KEY_NONE = const(0)
@@ -34,58 +53,121 @@ Direction = namedtuple("Direction", ("xdir", "ydir"))
 Position = namedtuple("Position", ("x", "y"))
 
 
-class SnakeNode:
-    def __init__(self, position=None, direction=None, next=None):
-        self.pos = position  # x/y position of the node on the grid
-        self.dir = direction  # direction this node is traveling in
-        self.next = next  # pointer to the next snake node, going from head to tail
-
-
 class Snake:
-    def __init__(self, grid_width, grid_height, tile_size, lcd):
+    def __init__(self, grid_width, grid_height, tile_size, lcd, sprites=None):
+        """
+        :param sprites: Sprites instance to draw with, only needed for show().
+        """
         self.grid_width = grid_width
         self.grid_height = grid_height
         self.tile_size = tile_size
         self.lcd = lcd
-
-        center_of_grid = Position(x=self.grid_width//2, y=self.grid_height//2)
+        self.sprites = sprites
+        # link bit for the difference between the cells of two neighboring
+        # segments. Across the edge of the grid the segments are not linked.
+        self.links = {
+            -grid_width: LINK_UP,
+            grid_width: LINK_DOWN,
+            -1: LINK_LEFT,
+            1: LINK_RIGHT,
+        }
+
+        # The body is a ring of cell indices (y * grid_width + x), sized so
+        # the snake can fill the whole grid. head_index is the ring slot of
+        # the head, the following length-1 slots hold the body up to the tail.
+        self.capacity = grid_width * grid_height
+        if self.capacity <= 256:
+            self.body = bytearray(self.capacity)
+        else:
+            self.body = array("H", (0 for _ in range(self.capacity)))
+        self.head_index = 0
+        self.length = 1
+        # number of body segments on each cell, kept up to date by push()
+        # and pop() so that collision checks don't need to walk the body
+        self.occupied = bytearray(self.capacity)
+
+        # free_cells[:free_count] lists the unoccupied cells in no particular
+        # order, free_slot[cell] is the position of cell in that list. This
+        # allows picking a random free cell and updating the list in O(1).
+        if self.capacity <= 256:
+            self.free_cells = bytearray(range(self.capacity))
+            self.free_slot = bytearray(range(self.capacity))
+        else:
+            self.free_cells = array("H", range(self.capacity))
+            self.free_slot = array("H", range(self.capacity))
+        self.free_count = self.capacity
+
+        center = self.cell(self.grid_width//2, self.grid_height//2)
+        self.body[0] = center
+        self.occupied[center] = 1
+        self.occupy(center)
         self.direction = Direction(xdir=0, ydir=0)
-        self.head = SnakeNode(position=center_of_grid, direction=self.direction)
 
-    def push(self, new_head):
-        """Append a new head at the front of the snake"""
-        new_head.next, self.head = self.head, new_head
+    def cell(self, x, y):
+        return y * self.grid_width + x
 
-    def pop(self):
-        current_node = self.head
-        previous_node = None
+    def head(self):
+        """cell index of the head"""
+        return self.body[self.head_index]
 
-        # loop through entire list of SnakeNodes
-        while current_node.next != None:
-            previous_node = current_node
-            current_node = current_node.next
-
-        # loop ends: final node in current_node, penultimate node in previous_node
-        # if there is a previous_node (i.e. this is not the head node)
-        if previous_node != None:
-            previous_node.next = None # clear pointer to final node
-            del current_node  # maybe this works as a hint to the garbage collector?
-
-    def contains(self, position: Position):
-        current_node = self.head
+    def tail(self):
+        """cell index of the tail"""
+        return self.body[(self.head_index + self.length - 1) % self.capacity]
 
-        while current_node != None:
-            if current_node.pos == position:
-                return True
+    def push(self, new_head):
+        """Append a new head (cell index) at the front of the snake"""
+        self.head_index = (self.head_index - 1) % self.capacity
+        self.body[self.head_index] = new_head
+        if self.occupied[new_head] == 0:
+            self.occupy(new_head)
+        self.occupied[new_head] += 1
+        self.length += 1
 
-            current_node = current_node.next
+    def pop(self):
+        """Remove the tail unless only the head is left. Returns its cell."""
+        tail = self.tail()
+        if self.length > 1:
+            self.length -= 1
+            self.occupied[tail] -= 1
+            if self.occupied[tail] == 0:
+                self.vacate(tail)
+        return tail
+
+    def occupy(self, cell):
+        """remove cell from the list of free cells"""
+        slot = self.free_slot[cell]
+        self.free_count -= 1
+        last = self.free_cells[self.free_count]
+        self.free_cells[slot] = last
+        self.free_slot[last] = slot
+
+    def vacate(self, cell):
+        """add cell to the list of free cells"""
+        self.free_cells[self.free_count] = cell
+        self.free_slot[cell] = self.free_count
+        self.free_count += 1
 
-        return False
+    def contains(self, position: Position):
+        return self.contains_cell(self.cell(position[0], position[1]))
+
+    def contains_cell(self, cell):
+        return self.occupied[cell] != 0
+
+    def cells(self):
+        """iterate over the cell indices of the snake, from head to tail"""
+        body = self.body
+        capacity = self.capacity
+        i = self.head_index
+        for _ in range(self.length):
+            yield body[i]
+            i += 1
+            if i == capacity:
+                i = 0
 
     def move(self):
-        # unpack direction and position of head node
+        # unpack direction and position of head
         x_dir, y_dir = self.direction
-        head_x, head_y = self.head.pos
+        head_y, head_x = divmod(self.head(), self.grid_width)
 
         # update position according to direction
         head_x += x_dir
@@ -95,51 +177,45 @@ class Snake:
         head_x %= self.grid_width
         head_y %= self.grid_height
 
-        # create and return new head node
-        new_head_position = Position(x=head_x, y=head_y)
-        new_node = SnakeNode(new_head_position, self.direction)
+        # return cell index of new head
+        return self.cell(head_x, head_y)
 
-        return new_node
+    def at(self, k):
+        """cell index of the k-th segment, counting from the head"""
+        return self.body[(self.head_index + k) % self.capacity]
 
     def show(self):
-        current_node = self.head
-
-        while current_node != None:
-            if current_node != self.head:
-
-                x1, y1 = current_node.pos
-                x2, y2 = previous_node.pos
-
-                invisible = (abs(x1-x2)>1) or (abs(y1-y2)>1)
-
-                if not invisible:
-                    x1 *= self.tile_size
-                    y1 *= self.tile_size
-
-                    x2 *= self.tile_size
-                    y2 *= self.tile_size
-
-                    x1 += self.tile_size//2
-                    y1 += self.tile_size//2
-
-                    x2 += self.tile_size//2
-                    y2 += self.tile_size//2
-
-                    self.line(x1, y1, x2, y2)
-
-            else:
-                # draw circle for snake head
-                grid_x, grid_y = current_node.pos
-                canvas_x = (self.tile_size * grid_x)
-                canvas_y = (self.tile_size * grid_y)
-                center_x = canvas_x+(self.tile_size//2)
-                center_y = canvas_y+(self.tile_size//2)
-                radius = (self.tile_size-4)//2
-
-                self.lcd.ellipse(center_x, center_y, radius, radius, snake_color, True)
+        previous = None
+        cell = None
+
+        for following in self.cells():
+            if cell is not None:
+                self.show_tile(cell, previous, following)
+            previous, cell = cell, following
+        self.show_tile(cell, previous, None)
+
+    def show_segment(self, k):
+        """draw only the tile of the k-th segment, counting from the head"""
+        if k < self.length:
+            self.show_tile(
+                self.at(k),
+                self.at(k - 1) if k > 0 else None,
+                self.at(k + 1) if k < self.length - 1 else None,
+            )
 
-            previous_node = current_node
-            current_node = current_node.next
+    def show_tile(self, cell, previous, following):
+        """
+        draw the segment on cell, linked to its neighbors towards the head
+        (previous, None for the head itself) and the tail (following)
+        """
+        links = self.links
+        mask = 0 if following is None else links.get(following - cell, 0)
+        if previous is None:
+            sprite = self.sprites.head[mask]
+        else:
+            sprite = self.sprites.body[mask | links.get(previous - cell, 0)]
+        grid_y, grid_x = divmod(cell, self.grid_width)
+        self.lcd.blit(sprite, grid_x * self.tile_size, grid_y * self.tile_size)
 
     def moving(self):
         return self.direction != (0, 0)
@@ -166,72 +242,65 @@ class Snake:
 
         self.direction = Direction(xdir=x_dir, ydir=y_dir)
 
-    def line(self, x1, y1, x2, y2):
-        start_x = min(x1, x2)
-        start_y = min(y1, y2)
-
-        line_thickness = 4
-        offset = line_thickness//2
-
-        start_x -= offset
-        start_y -= offset
-
-        # for horizontal lines
-        if x1 == x2:
-            line_width = offset * 2
-            line_height = offset + abs(y1-y2) + offset
-
-        # for vertical lines
-        elif y1 == y2:
-            line_width = offset + abs(x1-x2) + offset
-            line_height = offset * 2
-
-        self.lcd.rect(start_x, start_y, line_width, line_height, snake_color, True)
+    def positions(self):
+        """iterate over the positions of all cells, from head to tail"""
+        for cell in self.cells():
+            y, x = divmod(cell, self.grid_width)
+            yield Position(x=x, y=y)
 
     def gamestate_string(self):
-        current_node = self.head
         string_parts = []
-        while current_node != None:
-            string_parts.append(f"{current_node.pos.x},{current_node.pos.y}")
-            current_node = current_node.next
+        for cell in self.cells():
+            y, x = divmod(cell, self.grid_width)
+            string_parts.append(f"{x},{y}")
         return ";".join(string_parts)
 
 
 class Food:
-    def __init__(self, snake, grid_width, grid_height, tile_size, lcd):
+    def __init__(self, snake, grid_width, grid_height, tile_size, lcd, rng=random, sprites=None):
+        """
+        :param rng: Source of randomness with a randint() method, e.g. the
+            random module after random.seed() for reproducible placement.
+
+        :param sprites: Sprites instance to draw with, only needed for show().
+        """
         self.grid_width = grid_width
         self.grid_height = grid_height
         self.tile_size = tile_size
         self.lcd = lcd
+        self.sprites = sprites
+        self.rng = rng
         self.reset_position(snake)
 
     def reset_position(self, snake):
-        """sets new position for Food"""
-        new_pos = Position(
-            x=randint(0, self.grid_width-1), 
-            y=randint(0, self.grid_height-1),
-        )
-
-        # re-calculate if random position inside snake
-        while snake.contains(new_pos):
-            new_pos = Position(
-                x=randint(0, self.grid_width-1), 
-                y=randint(0, self.grid_height-1),
-            )
+        """
+        sets new position for Food, picked uniformly from the cells not
+        covered by the snake. Returns False, leaving the food off the grid,
+        if the snake covers the whole grid.
+        """
+        if snake.free_count == 0:
+            self.pos = None
+            self.cell = None
+            return False
 
-        self.pos = new_pos
+        cell = snake.free_cells[self.rng.randint(0, snake.free_count - 1)]
+        y, x = divmod(cell, self.grid_width)
+        self.pos = Position(x=x, y=y)
+        self.cell = cell
+        return True
 
     def show(self):
-        # calculate center of tile on canvas
-        tile_x = (self.tile_size * self.pos.x) + self.tile_size//2
-        tile_y = (self.tile_size * self.pos.y) + self.tile_size//2
-        radius = (self.tile_size-2)//2
-        self.lcd.ellipse(tile_x, tile_y, radius, radius, food_color, True)
+        if self.pos is None:
+            return
+        self.lcd.blit(self.sprites.food, self.tile_size * self.pos.x, self.tile_size * self.pos.y)
 
 
 
 class Game:
-    def __init__(self, grid_width, grid_height, tile_size, lcd, pubsubber):
+    def __init__(
+        self, grid_width, grid_height, tile_size, lcd, pubsubber, rng=random, partial_redraw=True, gc_budget=None,
+        render=True, recorder=None, profiler=None,
+    ):
         """
         Holds game state and manages all the game mechanics, drawing and 
         publishing of scores.
@@ -248,29 +317,99 @@ class Game:
         :param pubsubber: Instance of SnakePubsubber which holds scores of the
             other players and has a report_score() method for sending our 
             score to them.
+
+        :param rng: Source of randomness for food placement, see Food.
+
+        :param partial_redraw: While playing, redraw and send to the display
+            only the tiles that changed since the previous frame instead of
+            the whole screen.
+
+        :param gc_budget: GcBudget deciding when to collect garbage, by
+            default one with its default thresholds.
+
+        :param render: Draw and flush frames. Without, the game runs headless,
+            as fast as the logic allows, for simulation and benchmarks.
+
+        :param recorder: replay.Recorder to record the game to. For a
+            recording that can be replayed, rng has to be the
+            replay.Xorshift32 seeded with the recorder's seed.
+
+        :param profiler: profiler.TickProfiler to time the phases of each
+            tick with.
         """
         self.lcd = lcd
         self.pubsubber = pubsubber
+        self.rng = rng
+        self.recorder = recorder
+        self.profiler = profiler
+        self.gc_budget = gc_budget if gc_budget is not None else GcBudget()
 
         self.grid_width = grid_width 
         self.grid_height = grid_height
         self.tile_size = tile_size
+        self.gamestate = GamestateEncoder(grid_width, grid_height)
+        self.sprites = Sprites(tile_size, snake_color, food_color, background_color)
 
         self.lcd.registerKeyUpCallback(self.keyUpPressed)
         self.lcd.registerKeyDownCallback(self.keyDownPressed)
         self.lcd.registerKeyLeftCallback(self.keyLeftPressed)
         self.lcd.registerKeyRightCallback(self.keyRightPressed)
 
-        self.key_press_to_process = KEY_NONE
-        self.frameCount = 0
+        # key presses from the interrupt handlers, one turn is taken per step
+        self.inputs = InputRing()
+        # time from a key press to the flushed frame showing the turn it
+        # caused: last, worst and total over input_count turns
+        self.turn_time = None
+        self.input_latency_us = 0
+        self.input_latency_max_us = 0
+        self.input_latency_total_us = 0
+        self.input_count = 0
         self.score = 0
         self.previous_score = 0  # needed to display score after crash and before reset
         self.target_score = 5
-        self.base_refresh = 0.01
-        self.slow, self.fast = 12, 2
+        self.slow, self.fast = 12, 2  # step interval in base_step_ms
+        self.base_step_ms = 10
+        # step interval in ms by score, speeding up no further past score 50
+        self.step_ms = array("H", (
+            int(self.map_to_range(score, 0, 50, self.slow, self.fast)) * self.base_step_ms
+            for score in range(51)
+        ))
         self.countdown = 20
         self.cooldown = self.countdown
 
+        # rendering: tiles changed since the last frame, and counters for the
+        # most recent frame and in total
+        self.render = render
+        self.partial_redraw = partial_redraw
+        self.full_redraw = True
+        self.damaged = []
+        # The stats bar is rendered into its own framebuffer whenever the
+        # scores_version of the pubsubber or the local player change, and
+        # blitted from there.
+        stats_height = self.lcd.height - game_stats_y
+        self.stats = framebuf.FrameBuffer(
+            bytearray(self.lcd.width * stats_height * 2), self.lcd.width, stats_height, framebuf.RGB565
+        )
+        self.stats_version = None
+        self.stats_player = None
+        self.draw_us = 0
+        self.pixels_touched = 0
+        self.frames_drawn = 0
+        self.draw_us_total = 0
+        self.pixels_touched_total = 0
+        self.partial_frame = False
+        self.flush_bytes = 0  # sent to the display
+        self.flush_bytes_total = 0
+
+        # step timing: deadline of the next step in ticks_us, and how late
+        # steps started (last, worst and total) or if they overran
+        self.deadline = None
+        self.steps = 0
+        self.late_us = 0
+        self.late_max_us = 0
+        self.late_total_us = 0
+        self.overruns = 0
+
         self.state = GAMESTATE_READY_TO_START
         self.init_level()
 
@@ -281,6 +420,7 @@ class Game:
             grid_height=self.grid_height,
             tile_size=self.tile_size,
             lcd=self.lcd,
+            sprites=self.sprites,
         )
         self.food = Food(
             snake=self.snake, 
@@ -288,88 +428,260 @@ class Game:
             grid_height=self.grid_height,
             tile_size=self.tile_size,
             lcd=self.lcd,
+            rng=self.rng,
+            sprites=self.sprites,
         )
-        self.key_press_to_process = KEY_NONE
+        self.won = False
+        self.inputs.clear()
         self.set_score(0)
-        self.report_gamestate()
-        gc.collect()
+        self.report_gamestate(keyframe=True)
+        self.gc_budget.idle()
 
     def set_score(self, new_score):
         self.score = new_score
         self.pubsubber.report_score(new_score)
 
-    def report_gamestate(self):
-        snake_state_str = self.snake.gamestate_string()
-        self.pubsubber.report_gamestate(
-            f"{self.food.pos.x},{self.food.pos.y};{snake_state_str}"
-        )
+    def report_gamestate(self, keyframe=False, head_cell=None, tail_removed=False, food_moved=False):
+        """
+        Publish the game state in the binary format of the gamestate module:
+        a keyframe with the full state if requested or due, otherwise a
+        delta with just the changes since the previous frame. Deltas are
+        published in batches; when the pubsubber can't add another one to
+        the batch waiting to be published, a keyframe replaces the batch.
+        """
+        if keyframe or self.gamestate.keyframe_due() or self.pubsubber.gamestate_needs_keyframe():
+            payload = self.gamestate.keyframe(self.snake.cells(), self.food.cell)
+        else:
+            payload = self.gamestate.delta(
+                head_cell, tail_removed, self.food.cell if food_moved else None
+            )
+        self.pubsubber.report_gamestate(payload)
 
     async def tick(self):
-        self.frame_skip = int(self.map_to_range(self.score, 0, 50, self.slow, self.fast))
-
-        if self.frameCount % self.frame_skip == 0:
-            self.draw_background()
-            self.draw_game_stats()
-
-            if self.state == GAMESTATE_READY_TO_START:
-                self.draw_game_objects()
-                self.show_how_to_start_hint()
-                if self.key_press_to_process != KEY_NONE:
-                    self.state = GAMESTATE_PLAYING
-
-            elif self.state == GAMESTATE_PLAYING:
-                self.draw_game_objects()
-                    
-                if self.key_press_to_process != KEY_NONE:
-                    self.snake.update_direction(self.key_press_to_process)
-                    self.key_press_to_process = KEY_NONE
-
-                new_head = self.snake.move()
-
-                # snake hit food
-                if new_head.pos == self.food.pos:
-                    self.set_score(self.score + 1)
-                    self.snake.push(new_head)
-                    self.food.reset_position(self.snake)
-                # snake hit wall or itself
-                elif self.snake.moving() and self.snake.contains(new_head.pos):
+        """
+        Run one game step, then sleep until the next one is due. Steps are
+        spaced by step_ms for the current score, counted from when the
+        previous step was due, so the time spent drawing does not slow the
+        game down.
+        """
+        now = ticks_us()
+        if self.deadline is None:
+            self.deadline = now
+        else:
+            late = ticks_diff(now, self.deadline)
+            self.steps += 1
+            self.late_us = late
+            self.late_total_us += late
+            if late > self.late_max_us:
+                self.late_max_us = late
+        if self.profiler is not None:
+            self.profiler.begin()
+
+        await self.step()
+        # the frame just went out, a good time to collect if needed
+        self.gc_budget.idle()
+        self.mark(PHASE_GC)
+        if self.profiler is not None:
+            self.profiler.end()
+
+        interval = self.step_ms[min(self.score, len(self.step_ms) - 1)]
+        self.deadline = ticks_add(self.deadline, interval * 1000)
+        wait = ticks_diff(self.deadline, ticks_us())
+        if wait < 0:
+            # the step took longer than its interval, start over from now
+            self.overruns += 1
+            self.deadline = ticks_us()
+            wait = 0
+        # round up: better a little late than early
+        await asyncio.sleep_ms((wait + 999) // 1000)
+
+    async def step(self):
+        """advance the game by one step and show the result"""
+        state = self.state
+        if self.state == GAMESTATE_READY_TO_START:
+            self.draw_frame()
+            # the key press stays queued to set the first direction
+            if self.inputs.pending():
+                self.state = GAMESTATE_PLAYING
+
+        elif self.state == GAMESTATE_PLAYING:
+            self.take_turn()
+            self.mark(PHASE_INPUT)
+
+            new_head = self.snake.move()
+
+            # snake hit food
+            if new_head == self.food.cell:
+                self.set_score(self.score + 1)
+                self.snake.push(new_head)
+                self.damage(new_head)
+                self.damage(self.snake.at(1))
+                if self.food.reset_position(self.snake):
+                    self.damage(self.food.cell)
+                    self.report_gamestate(head_cell=new_head, food_moved=True)
+                # snake fills the whole grid
+                else:
+                    self.won = True
                     self.previous_score = self.score
                     self.set_score(0)
                     self.cooldown = self.countdown
                     self.state = GAMESTATE_SHOW_SCORE
-                # snake moving regularly
-                else:
-                    self.snake.push(new_head)
-                    self.snake.pop()
-                    self.report_gamestate()
-
-            elif self.state == GAMESTATE_SHOW_SCORE:
-                self.cooldown -= 1
-                self.show_game_text()
-
-                if self.cooldown < 0:
-                    self.cooldown = self.countdown
-                    self.init_level()
-                    self.state = GAMESTATE_READY_TO_START
-
-            self.lcd.show()
-
-        self.frameCount += 1
-        gc.collect()
-        await asyncio.sleep(self.base_refresh)
+            # snake hit wall or itself
+            elif self.snake.moving() and self.snake.contains_cell(new_head):
+                self.previous_score = self.score
+                self.set_score(0)
+                self.cooldown = self.countdown
+                self.state = GAMESTATE_SHOW_SCORE
+            # snake moving regularly
+            else:
+                self.snake.push(new_head)
+                self.damage(new_head)
+                self.damage(self.snake.at(1))
+                self.damage(self.snake.pop())
+                self.damage(self.snake.tail())
+                self.report_gamestate(head_cell=new_head, tail_removed=True)
+
+            self.draw_frame()
+
+        elif self.state == GAMESTATE_SHOW_SCORE:
+            self.cooldown -= 1
+            self.draw_frame()
+
+            if self.cooldown < 0:
+                self.cooldown = self.countdown
+                self.init_level()
+                self.state = GAMESTATE_READY_TO_START
+
+        self.mark(PHASE_LOGIC)
+        await self.flush()
+        self.mark(PHASE_FLUSH)
+
+        if self.turn_time is not None:
+            latency = ticks_diff(ticks_us(), self.turn_time)
+            self.turn_time = None
+            self.input_latency_us = latency
+            self.input_latency_total_us += latency
+            self.input_count += 1
+            if latency > self.input_latency_max_us:
+                self.input_latency_max_us = latency
+
+        if self.recorder is not None:
+            self.recorder.record(self, state)
+
+    def take_turn(self):
+        """
+        Apply the oldest queued key press that changes direction. Presses
+        that don't, like the direction the snake already moves in, are
+        dropped on the way.
+        """
+        direction = self.snake.direction
+        while True:
+            key = self.inputs.get()
+            if key == KEY_NONE:
+                return
+            self.snake.update_direction(key)
+            if self.snake.direction != direction:
+                self.turn_time = self.inputs.time
+                return
+
+    def mark(self, phase):
+        """charge the time since the previous mark to phase, if profiling"""
+        if self.profiler is not None:
+            self.profiler.mark(phase)
 
     # the key*Pressed functions are registered as interrupt handlers
     def keyUpPressed(self):
-        self.key_press_to_process = KEY_UP
+        self.inputs.put(KEY_UP)
 
     def keyDownPressed(self):
-        self.key_press_to_process = KEY_DOWN
+        self.inputs.put(KEY_DOWN)
 
     def keyLeftPressed(self):
-        self.key_press_to_process = KEY_LEFT
+        self.inputs.put(KEY_LEFT)
 
     def keyRightPressed(self):
-        self.key_press_to_process = KEY_RIGHT
+        self.inputs.put(KEY_RIGHT)
+
+    def damage(self, cell):
+        """mark a grid cell as changed, to be redrawn in the next frame"""
+        if cell not in self.damaged:
+            self.damaged.append(cell)
+
+    def draw_frame(self):
+        """
+        Draw the screen for the current state: just the damaged tiles while
+        playing with partial_redraw, otherwise everything. Start and game
+        over screens are always drawn in full, as is the first frame after
+        them.
+        """
+        self.mark(PHASE_LOGIC)
+        if not self.render:
+            self.damaged.clear()
+            return
+        start = ticks_us()
+        partial = self.state == GAMESTATE_PLAYING and self.partial_redraw and not self.full_redraw
+        self.partial_frame = partial
+        if partial:
+            pixels = self.draw_damaged()
+        else:
+            self.draw_background()
+            self.draw_game_stats()
+            if self.state == GAMESTATE_READY_TO_START:
+                self.draw_game_objects()
+                self.show_how_to_start_hint()
+            elif self.state == GAMESTATE_PLAYING:
+                self.draw_game_objects()
+            else:
+                self.show_game_text()
+            pixels = self.lcd.width * self.lcd.height
+        self.full_redraw = self.state != GAMESTATE_PLAYING
+        self.damaged.clear()
+
+        self.draw_us = ticks_diff(ticks_us(), start)
+        self.pixels_touched = pixels
+        self.frames_drawn += 1
+        self.draw_us_total += self.draw_us
+        self.pixels_touched_total += pixels
+        self.mark(PHASE_DRAW)
+
+    async def flush(self):
+        """
+        Send the frame drawn last to the display. Full frames are sent with
+        show_async() so that MQTT keeps being served during the transfer.
+        """
+        if not self.render:
+            return
+        if self.partial_frame:
+            self.flush_bytes = self.lcd.show_dirty()
+        else:
+            self.flush_bytes = await self.lcd.show_async()
+        self.flush_bytes_total += self.flush_bytes
+
+    def draw_damaged(self):
+        """
+        Clear and redraw the damaged tiles, and the stats bar if a score
+        changed. Only the ends of the snake change from one frame to the
+        next: the new head, the segment behind it and the tail are redrawn.
+        Returns the number of pixels drawn.
+        """
+        tile_size = self.tile_size
+        for cell in self.damaged:
+            y, x = divmod(cell, self.grid_width)
+            self.lcd.rect(x * tile_size, y * tile_size, tile_size, tile_size, background_color, True)
+            self.lcd.mark_dirty(x * tile_size, y * tile_size, tile_size, tile_size)
+
+        if self.food.cell in self.damaged:
+            self.food.show()
+        self.snake.show_segment(0)
+        self.snake.show_segment(1)
+        self.snake.show_segment(self.snake.length - 1)
+
+        pixels = len(self.damaged) * tile_size * tile_size
+        if self.stats_stale():
+            self.draw_game_stats()
+            self.lcd.mark_dirty(0, game_stats_y, self.lcd.width, self.lcd.height - game_stats_y)
+            pixels += self.lcd.width * (self.lcd.height - game_stats_y)
+        return pixels
 
     def draw_background(self):
         self.lcd.fill(background_color)
@@ -378,40 +690,55 @@ class Game:
         self.food.show()
         self.snake.show()
 
+    def stats_stale(self):
+        return (
+            self.stats_version != self.pubsubber.scores_version
+            or self.stats_player != self.pubsubber.player_name_self
+        )
+
     def draw_game_stats(self):
-        y_pos = 125
-        box_y = y_pos - 2
+        self.mark(PHASE_DRAW)
+        if self.stats_stale():
+            self.render_game_stats()
+        self.lcd.blit(self.stats, 0, game_stats_y)
+        self.mark(PHASE_STATS)
+
+    def render_game_stats(self):
+        """draw the scores of all players, in columns, into self.stats"""
+        self.stats_version = self.pubsubber.scores_version
+        self.stats_player = self.pubsubber.player_name_self
+
+        stats = self.stats
         box_width = self.lcd.width
-        box_height = self.lcd.height - box_y
-        players = [
-            ("A", 0xf800), 
-            ("B", 0xf800), 
-            ("C", 0xf800), 
-            ("D", 0x07E0), 
-            ("E", 0x07E0), 
-            ("F", 0x07E0),
-        ]
+        box_height = self.lcd.height - game_stats_y
+        y_pos = 2
+        players = sorted(self.pubsubber.scores)
+        column = (box_width - 4) // len(players)
+        # narrow columns leave out the colon
+        wide = column >= 36
+        name_offset, score_offset = (3, 16) if wide else (1, 9)
 
         # background colors
-        self.lcd.rect(0, box_y, box_width, box_height, game_stats_bg_color, True)
+        stats.rect(0, 0, box_width, box_height, game_stats_bg_color, True)
 
-        for i, (player, color) in enumerate(players):
-            x_pos = 4 + i * 39
-            # dividing lines
+        previous_color = None
+        for i, player in enumerate(players):
+            x_pos = 4 + i * column
+            color = player_colors.get(player, game_stats_text_color)
+            # dividing lines, black between teams
             if i>0:
-                bar_color = 0x0000 if i == 3 else color
-                self.lcd.rect(x_pos - 3, box_y, 1, box_height, bar_color, True)
+                bar_color = 0x0000 if color != previous_color else color
+                stats.rect(x_pos - 3, 0, 1, box_height, bar_color, True)
+            previous_color = color
             # self highlight
             if player == self.pubsubber.player_name_self:
-                self.lcd.rect(x_pos - 1, box_y + 1, 36, box_height - 2, 0x07FF, True)
+                stats.rect(x_pos - 1, 1, min(36, column - 3), box_height - 2, 0x07FF, True)
             # text
             score = self.pubsubber.scores[player]
-            self.lcd.text(':', x_pos + 8, y_pos, color)
-            self.lcd.text(player, x_pos + 3, y_pos, color)
-            self.lcd.text(f"{score:2}", x_pos + 16, y_pos, color)
-
-        # self.lcd.text("Score", 90, y_pos, title_color)
-        # self.lcd.text(str(self.score), 146, y_pos, title_color)
+            if wide:
+                stats.text(':', x_pos + 8, y_pos, color)
+            stats.text(player, x_pos + name_offset, y_pos, color)
+            stats.text(f"{score:2}", x_pos + score_offset, y_pos, color)
 
     def show_title_screen(self):
         self.lcd.text("PiCo", 100, 50, title_color)
@@ -420,6 +747,8 @@ class Game:
     def show_game_text(self):
         if self.state == GAMESTATE_SHOW_SCORE:
             self.draw_game_objects()
+            if self.won:
+                self.lcd.text("YOU WIN", 90, 48, score_color)
             self.lcd.text("SCORE", 90, 60, score_color)
             self.lcd.text(str(self.previous_score), 150, 60, score_color)
 
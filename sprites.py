@@ -0,0 +1,65 @@
+# Prerendered tiles for the snake and the food, drawn with blit().
+#
+# A snake segment is drawn as arms reaching from the center of its tile
+# towards the neighboring segments, so each segment is one of a few tiles
+# picked by a mask of LINK_* bits: one bit for the tail, two for straight
+# and corner segments, none when both neighbors are across the edge of the
+# grid. The head has a circle on top and at most one link.
+import framebuf
+from micropython import const
+
+LINK_UP = const(1)
+LINK_DOWN = const(2)
+LINK_LEFT = const(4)
+LINK_RIGHT = const(8)
+
+LINK_THICKNESS = const(4)
+
+
+def link_count(mask):
+    return (mask & 1) + (mask >> 1 & 1) + (mask >> 2 & 1) + (mask >> 3 & 1)
+
+
+class Sprites:
+    def __init__(self, tile_size, snake_color, food_color, background_color):
+        """
+        Renders every tile once for the given tile_size. Tiles are indexed
+        by link mask, None where no segment can have that mask.
+        """
+        self.tile_size = tile_size
+        self.snake_color = snake_color
+        self.background_color = background_color
+
+        self.body = [self.segment(mask, False) if link_count(mask) <= 2 else None for mask in range(16)]
+        self.head = [self.segment(mask, True) if link_count(mask) <= 1 else None for mask in range(16)]
+
+        self.food = self.tile()
+        center = tile_size // 2
+        radius = (tile_size - 2) // 2
+        self.food.ellipse(center, center, radius, radius, food_color, True)
+
+    def tile(self):
+        size = self.tile_size
+        tile = framebuf.FrameBuffer(bytearray(size * size * 2), size, size, framebuf.RGB565)
+        tile.fill(self.background_color)
+        return tile
+
+    def segment(self, mask, head):
+        tile = self.tile()
+        size = self.tile_size
+        center = size // 2
+        offset = LINK_THICKNESS // 2
+        color = self.snake_color
+
+        if head:
+            radius = (size - 4) // 2
+            tile.ellipse(center, center, radius, radius, color, True)
+        if mask & LINK_UP:
+            tile.rect(center - offset, 0, LINK_THICKNESS, center + offset, color, True)
+        if mask & LINK_DOWN:
+            tile.rect(center - offset, center - offset, LINK_THICKNESS, size - center + offset, color, True)
+        if mask & LINK_LEFT:
+            tile.rect(0, center - offset, center + offset, LINK_THICKNESS, color, True)
+        if mask & LINK_RIGHT:
+            tile.rect(center - offset, center - offset, size - center + offset, LINK_THICKNESS, color, True)
+        return tile